@@ -0,0 +1,579 @@
+import os
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+import uvicorn
+from telegram import Update
+from telegram.ext import (
+    ApplicationBuilder, BaseUpdateProcessor, CommandHandler, MessageHandler,
+    CallbackQueryHandler, ConversationHandler, filters
+)
+from balances import balance_cache
+from config import TELEGRAM_GROUP_URL, BALANCE_WATCH_INTERVAL, RECEIPT_POLL_INTERVAL, DATABASE_URL
+from database import UserDatabase
+from ingest import UpdateDeduplicator
+from outbox import RateLimiter, PRIORITY_NORMAL, PRIORITY_TRANSACTIONAL
+from receipts import ReceiptTracker
+from router import Router
+from slh_wallet import SLHWallet
+from status import StatusMonitor, webhook_info_dict, rpc_health
+from tokens import token_registry
+from views import (
+    SETTING_CONTACT, TRANSFER_AMOUNT, TRANSFER_RECIPIENT,
+    get_main_keyboard, get_wallet_keyboard, get_transfer_keyboard, get_contracts_keyboard,
+    get_gift_keyboard, get_settings_keyboard,
+    welcome_text, wallet_text, NO_WALLET_TEXT, TRANSFER_MENU_TEXT, TRANSFER_AMOUNT_PROMPT,
+    PRIVATE_KEY_REQUIRED_TEXT, transfer_recipient_prompt, insufficient_balance_text,
+    transfer_confirm_text, TRANSFER_PENDING_TEXT, transfer_success_text, transfer_settled_text, transfer_error_text,
+    PRIVATE_KEY_PROMPT, private_key_saved_text, GIFT_MENU_TEXT, CREATE_CONTRACT_TEXT,
+    MY_CONTRACTS_TEXT, COMMUNITY_TEXT, settings_text, stats_text, SLH_INFO_TEXT,
+    wallet_saved_text, parse_contact_info, contact_saved_text, UPDATE_CONTACT_TEXT,
+    CONTACT_CONV_PROMPT, join_confirmed_text
+)
+
+# Async serving mode: FastAPI/uvicorn webhook in front of a python-telegram-bot 20
+# Application. Run with `python async_bot.py` or `uvicorn async_bot:app`.
+
+# ==================== CONFIGURATION ====================
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+PORT = int(os.getenv('PORT', 10000))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+
+# Updates processed concurrently by the Application (ordered per chat)
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', 256))
+# Threads for blocking SQLite / web3 calls, shared by all conversations
+ASYNC_IO_THREADS = int(os.getenv('ASYNC_IO_THREADS', 32))
+# Recently seen update_ids, so Telegram retries are dropped before parsing
+WEBHOOK_DEDUP_SIZE = int(os.getenv('WEBHOOK_DEDUP_SIZE', 10000))
+
+# Outbound Bot API limits (messages per second)
+SEND_RATE_GLOBAL = float(os.getenv('SEND_RATE_GLOBAL', 30))
+SEND_RATE_CHAT = float(os.getenv('SEND_RATE_CHAT', 1))
+SEND_RATE_GROUP = float(os.getenv('SEND_RATE_GROUP', 20 / 60))
+
+# Seconds between background refreshes of webhook info and RPC health for /status
+STATUS_REFRESH_INTERVAL = int(os.getenv('STATUS_REFRESH_INTERVAL', 30))
+
+# Logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+if not BOT_TOKEN:
+    raise ValueError("BOT_TOKEN must be set")
+
+db = UserDatabase()
+if DATABASE_URL:
+    # SQLModel tables (users, store, history), created and migrated before first use
+    from engine import init_db
+    init_db()
+wallet_manager = SLHWallet()
+
+dedup = UpdateDeduplicator(WEBHOOK_DEDUP_SIZE)
+rate_limiter = RateLimiter(global_rate=SEND_RATE_GLOBAL, chat_rate=SEND_RATE_CHAT, group_rate=SEND_RATE_GROUP)
+
+io_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_THREADS, thread_name_prefix='slh-io')
+
+async def run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+# ==================== UPDATE PROCESSOR ====================
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    # Runs updates of different chats concurrently but keeps each chat's
+    # updates in arrival order, so ConversationHandler states stay consistent.
+    # The chat lock is taken before the base class's concurrency semaphore:
+    # an update queued behind its own chat must not hold a slot that updates
+    # of other chats could use.
+    def __init__(self, max_concurrent_updates):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}
+        self._waiting = {}
+
+    async def process_update(self, update, coroutine):
+        chat = getattr(update, 'effective_chat', None)
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+
+        key = chat.id
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._waiting[key] = self._waiting.get(key, 0) + 1
+        try:
+            async with lock:
+                await super().process_update(update, coroutine)
+        finally:
+            self._waiting[key] -= 1
+            if not self._waiting[key]:
+                del self._waiting[key]
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+# ==================== BOT HANDLERS ====================
+async def reply(update, text, priority=PRIORITY_NORMAL, **kwargs):
+    message = update.effective_message
+    return await rate_limiter.call_async(message.chat_id, message.reply_text, text, priority=priority, **kwargs)
+
+async def start(update, context):
+    user = update.effective_user
+    await run_blocking(db.add_user, user.id, user.username, user.first_name, user.last_name)
+
+    await reply(update, welcome_text(user.first_name), reply_markup=get_main_keyboard(), parse_mode='Markdown')
+
+async def handle_message(update, context):
+    return await message_router.dispatch_async(update.message.text, update, context)
+
+async def unknown_message(update, context):
+    await reply(update, "🤔 בחר אחת האפשרויות מהתפריט", reply_markup=get_main_keyboard())
+
+async def wallet_address_message(update, context):
+    await save_wallet_address(update, context, update.message.text)
+
+async def my_wallet(update, context):
+    user = update.effective_user
+    user_data = await run_blocking(db.get_user, user.id)
+
+    if user_data and user_data.wallet_address:
+        current_balance = await run_blocking(wallet_manager.get_balance, user_data.wallet_address)
+        await reply(update, wallet_text(user_data, current_balance), parse_mode='Markdown', reply_markup=get_wallet_keyboard())
+    else:
+        await reply(update, NO_WALLET_TEXT, parse_mode='Markdown')
+
+async def transfer_menu(update, context):
+    await reply(update, TRANSFER_MENU_TEXT, parse_mode='Markdown', reply_markup=get_transfer_keyboard())
+
+async def start_transfer_to_wallet(update, context):
+    await update.callback_query.answer()
+    await reply(update, TRANSFER_AMOUNT_PROMPT)
+    return TRANSFER_AMOUNT
+
+async def handle_transfer_amount(update, context):
+    text = update.message.text
+
+    if text.lower() == 'ביטול':
+        await reply(update, "העברה בוטלה", reply_markup=get_main_keyboard())
+        return ConversationHandler.END
+
+    try:
+        amount = float(text)
+    except ValueError:
+        await reply(update, "❌ כמות לא תקינה. נסה שוב:")
+        return TRANSFER_AMOUNT
+
+    if amount <= 0:
+        await reply(update, "❌ הכמות חייבת להיות גדולה מ-0. נסה שוב:")
+        return TRANSFER_AMOUNT
+
+    context.user_data['transfer_amount'] = amount
+
+    if not context.user_data.get('private_key'):
+        await reply(update, PRIVATE_KEY_REQUIRED_TEXT)
+        return ConversationHandler.END
+
+    await reply(update, transfer_recipient_prompt(amount))
+    return TRANSFER_RECIPIENT
+
+async def handle_transfer_recipient(update, context):
+    text = update.message.text
+
+    if text.lower() == 'ביטול':
+        await reply(update, "🚫 ההעברה בוטלה", reply_markup=get_main_keyboard())
+        return ConversationHandler.END
+
+    to_address = text.strip()
+
+    if not wallet_manager.validate_wallet_address(to_address):
+        await reply(update, "❌ כתובת ארנק לא תקינה. נסה שוב:")
+        return TRANSFER_RECIPIENT
+
+    context.user_data['transfer_address'] = to_address
+    amount = context.user_data['transfer_amount']
+    private_key = context.user_data.get('private_key')
+
+    try:
+        sender_address = wallet_manager.w3.eth.account.from_key(private_key).address
+        sender_balance = await run_blocking(wallet_manager.get_balance, sender_address)
+
+        if sender_balance < amount:
+            await reply(update, insufficient_balance_text(sender_balance, amount))
+            return ConversationHandler.END
+
+    except Exception as e:
+        logger.error(f"Balance check error: {e}")
+        await reply(update, "❌ שגיאה בבדיקת יתרה. נסה שוב.")
+        return ConversationHandler.END
+
+    await reply(update, transfer_confirm_text(to_address, amount), parse_mode='Markdown')
+    return "CONFIRM_TRANSFER"
+
+async def confirm_transfer(update, context):
+    text = update.message.text
+    user = update.effective_user
+
+    if text == '✅ אישור':
+        amount = context.user_data['transfer_amount']
+        to_address = context.user_data['transfer_address']
+        private_key = context.user_data.get('private_key')
+
+        try:
+            await reply(update, TRANSFER_PENDING_TEXT, priority=PRIORITY_TRANSACTIONAL)
+
+            result = await run_blocking(wallet_manager.transfer_tokens, private_key, to_address, amount)
+
+            if result['success']:
+                # Recorded for every sender, with or without a saved wallet address: it stays
+                # pending until the receipt tracker sees it mined (or its nonce used) and tells the user
+                await run_blocking(db.add_transaction, user.id, None, amount, result['tx_hash'], from_address=result['from'], nonce=result['nonce'])
+
+                await reply(update, transfer_success_text(to_address, amount, result), parse_mode='Markdown', priority=PRIORITY_TRANSACTIONAL)
+            else:
+                await reply(update, transfer_error_text(result['error']), parse_mode='Markdown', priority=PRIORITY_TRANSACTIONAL)
+
+        except Exception as e:
+            logger.error(f"Transfer execution error: {e}")
+            await reply(update, "❌ שגיאה בביצוע ההעברה. נסה שוב מאוחר יותר.", priority=PRIORITY_TRANSACTIONAL)
+
+    elif text == '❌ ביטול':
+        await reply(update, "🚫 ההעברה בוטלה", reply_markup=get_main_keyboard())
+    else:
+        await reply(update, "❌ אנא שלח '✅ אישור' או '❌ ביטול'")
+        return "CONFIRM_TRANSFER"
+
+    return ConversationHandler.END
+
+async def set_private_key(update, context):
+    await update.callback_query.answer()
+    await reply(update, PRIVATE_KEY_PROMPT)
+    return "SET_PRIVATE_KEY"
+
+async def handle_private_key_input(update, context):
+    text = update.message.text
+
+    if text.lower() == 'ביטול':
+        await reply(update, "ביטול הגדרת Private Key", reply_markup=get_main_keyboard())
+        return ConversationHandler.END
+
+    if not (text.startswith('0x') and len(text) == 66):
+        await reply(update, "❌ Private Key לא תקין. נסה שוב:")
+        return "SET_PRIVATE_KEY"
+
+    try:
+        account = wallet_manager.w3.eth.account.from_key(text)
+    except Exception:
+        await reply(update, "❌ Private Key לא תקין. נסה שוב:")
+        return "SET_PRIVATE_KEY"
+
+    context.user_data['private_key'] = text
+    await reply(update, private_key_saved_text(account.address), reply_markup=get_main_keyboard())
+    return ConversationHandler.END
+
+async def send_gift_menu(update, context):
+    await reply(update, GIFT_MENU_TEXT, parse_mode='Markdown', reply_markup=get_gift_keyboard())
+
+async def create_contract(update, context):
+    await reply(update, CREATE_CONTRACT_TEXT, parse_mode='Markdown')
+
+async def my_contracts(update, context):
+    await reply(update, MY_CONTRACTS_TEXT, parse_mode='Markdown', reply_markup=get_contracts_keyboard())
+
+async def community_join(update, context):
+    await reply(update, COMMUNITY_TEXT, parse_mode='Markdown')
+
+async def settings_menu(update, context):
+    user = update.effective_user
+    user_data = await run_blocking(db.get_user, user.id)
+
+    has_private_key = "✅ מוגדר" if context.user_data.get('private_key') else "❌ לא מוגדר"
+    await reply(update, settings_text(user_data, has_private_key), parse_mode='Markdown', reply_markup=get_settings_keyboard())
+
+async def user_stats(update, context):
+    user = update.effective_user
+    user_data = await run_blocking(db.get_user, user.id)
+    await reply(update, stats_text(user_data), parse_mode='Markdown')
+
+async def slh_info(update, context):
+    await reply(update, SLH_INFO_TEXT, parse_mode='Markdown')
+
+async def save_wallet_address(update, context, wallet_address):
+    user = update.effective_user
+
+    if not wallet_address.startswith('0x') or len(wallet_address) != 42:
+        await reply(update, "❌ כתובת ארנק לא תקינה. אנא שלח כתובת בפורמט הנכון.")
+        return
+
+    try:
+        await run_blocking(db.update_wallet, user.id, wallet_address)
+        current_balance = await run_blocking(wallet_manager.get_balance, wallet_address)
+        await reply(update, wallet_saved_text(wallet_address, current_balance), parse_mode='Markdown')
+    except Exception as e:
+        logger.error(f"Error saving wallet: {e}")
+        await reply(update, "❌ אירעה שגיאה בשמירת כתובת הארנק. נסה שוב.")
+
+async def start_contact_update(update, context):
+    await update.callback_query.answer()
+    await reply(update, CONTACT_CONV_PROMPT)
+    return SETTING_CONTACT
+
+async def handle_contact_update(update, context):
+    user = update.effective_user
+
+    try:
+        phone, website, materials = parse_contact_info(update.message.text)
+        await run_blocking(db.update_contact_info, user.id, phone, website, materials)
+        await reply(update, contact_saved_text(phone, website, materials), parse_mode='Markdown')
+        return ConversationHandler.END
+    except Exception as e:
+        logger.error(f"Error saving contact info: {e}")
+        await reply(update, "❌ שגיאה בשמירת הפרטים. נסה שוב בפורמט הנכון.")
+        return SETTING_CONTACT
+
+async def handle_callback(update, context):
+    query = update.callback_query
+    result = await callback_router.dispatch_async(query.data, update, context)
+    await query.answer()
+    return result
+
+async def back_main(update, context):
+    await reply(update, "🔙 חזרת לתפריט הראשי", reply_markup=get_main_keyboard())
+
+async def contracts_coming_soon(update, context):
+    await reply(update, "📋 **החוזים הפעילים שלך:**\n\n*בקרוב - פיצ'ר בפיתוח*", parse_mode='Markdown')
+
+async def quick_gift(update, context):
+    await reply(update, "🎁 **מתנה מהירה:**\n\n*בקרוב - פיצ'ר בפיתוח*", parse_mode='Markdown')
+
+async def update_contact(update, context):
+    await reply(update, UPDATE_CONTACT_TEXT, parse_mode='Markdown')
+
+async def confirm_join(update, context):
+    user = update.callback_query.from_user
+    await run_blocking(db.mark_joined_group, user.id)
+    await reply(update, join_confirmed_text(user.first_name), parse_mode='Markdown')
+
+async def cancel(update, context):
+    await reply(update, "ביטול", reply_markup=get_main_keyboard())
+    return ConversationHandler.END
+
+async def cancel_transfer(update, context):
+    await reply(update, "העברה בוטלה", reply_markup=get_main_keyboard())
+    return ConversationHandler.END
+
+# ==================== ROUTES ====================
+message_router = Router('message', exact={
+    "👛 הארנק שלי": my_wallet,
+    "🎁 שלח מתנה": send_gift_menu,
+    "💸 העברת SLH": transfer_menu,
+    "📝 צור חוזה": create_contract,
+    "📊 החוזים שלי": my_contracts,
+    "👥 הצטרף לקהילה": community_join,
+    "⚙️ הגדרות": settings_menu,
+    "📈 סטטיסטיקות": user_stats,
+    "ℹ️ מידע": slh_info,
+}, patterns=[
+    (r'0x.{40}$', wallet_address_message),
+], fallback=unknown_message)
+
+callback_router = Router('callback', exact={
+    "back_main": back_main,
+    "back_wallet": my_wallet,
+    "transfer_slh": transfer_menu,
+    "my_contracts": contracts_coming_soon,
+    "quick_gift": quick_gift,
+    "update_contact": update_contact,
+    "confirm_join": confirm_join,
+})
+
+# ==================== APPLICATION ====================
+TEXT = filters.TEXT & ~filters.COMMAND
+
+contact_conv_handler = ConversationHandler(
+    entry_points=[CallbackQueryHandler(start_contact_update, pattern='^update_contact$')],
+    states={
+        SETTING_CONTACT: [MessageHandler(TEXT, handle_contact_update)],
+    },
+    fallbacks=[CommandHandler('cancel', cancel)]
+)
+
+transfer_conv_handler = ConversationHandler(
+    entry_points=[CallbackQueryHandler(start_transfer_to_wallet, pattern='^transfer_wallet$')],
+    states={
+        TRANSFER_AMOUNT: [MessageHandler(TEXT, handle_transfer_amount)],
+        TRANSFER_RECIPIENT: [MessageHandler(TEXT, handle_transfer_recipient)],
+        "CONFIRM_TRANSFER": [MessageHandler(TEXT, confirm_transfer)],
+    },
+    fallbacks=[CommandHandler('cancel', cancel_transfer)]
+)
+
+private_key_conv_handler = ConversationHandler(
+    entry_points=[CallbackQueryHandler(set_private_key, pattern='^set_private_key$')],
+    states={
+        "SET_PRIVATE_KEY": [MessageHandler(TEXT, handle_private_key_input)],
+    },
+    fallbacks=[CommandHandler('cancel', cancel)]
+)
+
+application = (
+    ApplicationBuilder()
+    .token(BOT_TOKEN)
+    .updater(None)
+    .concurrent_updates(ChatOrderedUpdateProcessor(CONCURRENT_UPDATES))
+    .build()
+)
+application.add_handler(CommandHandler("start", start))
+application.add_handler(contact_conv_handler)
+application.add_handler(transfer_conv_handler)
+application.add_handler(private_key_conv_handler)
+application.add_handler(MessageHandler(TEXT, handle_message))
+application.add_handler(CallbackQueryHandler(handle_callback))
+
+# ==================== RECEIPTS ====================
+event_loop = None
+
+def notify_transaction(user_id, tx_hash, amount, status, receipt):
+    # Called on the tracker thread; the send itself runs on the event loop
+    asyncio.run_coroutine_threadsafe(rate_limiter.call_async(
+        user_id, application.bot.send_message, user_id, transfer_settled_text(tx_hash, amount, status, receipt),
+        parse_mode='Markdown', priority=PRIORITY_TRANSACTIONAL
+    ), event_loop).result()
+
+receipt_tracker = ReceiptTracker(
+    wallet_manager.w3, db, notify=notify_transaction, cache=balance_cache, nonces=wallet_manager.nonces
+)
+
+# ==================== STATUS ====================
+status_monitor = StatusMonitor(STATUS_REFRESH_INTERVAL)
+status_monitor.add_check('rpc', lambda: rpc_health(wallet_manager.w3))
+status_monitor.add_gauge('update_queue', lambda: application.update_queue.qsize())
+status_monitor.add_gauge('dedup', dedup.stats)
+status_monitor.add_gauge('database', db.stats)
+status_monitor.add_gauge('tokens', token_registry.stats)
+status_monitor.add_gauge('balances', balance_cache.stats)
+status_monitor.add_gauge('transfer_index', lambda: wallet_manager.transfer_index.stats() if wallet_manager.transfer_index else {})
+status_monitor.add_gauge('nonces', wallet_manager.nonces.stats)
+status_monitor.add_gauge('receipts', receipt_tracker.stats)
+status_monitor.add_gauge('gas', lambda: {**wallet_manager.gas_oracle.stats(), **wallet_manager.gas.stats()})
+status_monitor.add_gauge('rpc_provider', lambda: getattr(wallet_manager.w3.provider, 'stats', dict)())
+status_monitor.add_gauge('outbound', rate_limiter.stats)
+status_monitor.add_gauge('routes', lambda: {
+    'message': message_router.stats(),
+    'callback': callback_router.stats(),
+})
+
+async def refresh_webhook_status():
+    started = time.monotonic()
+    try:
+        info = await application.bot.get_webhook_info()
+    except Exception as e:
+        logger.warning(f"Status check webhook failed: {e}")
+        status_monitor.record('webhook', error=e, latency=time.monotonic() - started)
+    else:
+        status_monitor.record('webhook', webhook_info_dict(info), latency=time.monotonic() - started)
+
+async def refresh_status():
+    while True:
+        await refresh_webhook_status()
+        await run_blocking(status_monitor.run_check, 'rpc')
+        await asyncio.sleep(STATUS_REFRESH_INTERVAL)
+
+# ==================== FASTAPI ROUTES ====================
+@asynccontextmanager
+async def lifespan(_app):
+    global event_loop
+    async with application:
+        await application.start()
+        # initialize() already fetched getMe
+        status_monitor.set_identity(application.bot.bot)
+        await run_blocking(wallet_manager.warm_up)
+        if BALANCE_WATCH_INTERVAL:
+            wallet_manager.watch_transfers(BALANCE_WATCH_INTERVAL)
+        if RECEIPT_POLL_INTERVAL:
+            event_loop = asyncio.get_running_loop()
+            receipt_tracker.start()
+        status_task = asyncio.create_task(refresh_status())
+        logger.info(f"🚀 Async SLH Bot started as @{application.bot.username}")
+        yield
+        status_task.cancel()
+        await application.stop()
+    io_executor.shutdown(wait=False)
+
+app = FastAPI(lifespan=lifespan)
+
+@app.get('/')
+async def home():
+    return {
+        "status": "SLH Platform - FULLY ACTIVE 🟢",
+        "bot": status_monitor.bot_username(),
+        "features": "Wallet, Transfers, Gifts, Contracts, Community",
+        "community": TELEGRAM_GROUP_URL
+    }
+
+@app.post(WEBHOOK_PATH)
+async def webhook(request: Request):
+    update_id = None
+    try:
+        payload = await request.json()
+        update_id = payload.get('update_id')
+        if dedup.seen(update_id):
+            return Response(content="OK")
+        update = Update.de_json(payload, application.bot)
+        await application.update_queue.put(update)
+        return Response(content="OK")
+    except Exception as e:
+        logger.error(f"Webhook error: {e}")
+        if update_id is not None:
+            dedup.forget(update_id)
+        return Response(content="Error", status_code=500)
+
+@app.get('/set_webhook')
+async def set_webhook(request: Request):
+    try:
+        webhook_url = f"https://{request.headers.get('host')}{WEBHOOK_PATH}"
+        await application.bot.delete_webhook()
+        success = await application.bot.set_webhook(webhook_url)
+        await refresh_webhook_status()
+
+        if success:
+            return {
+                "status": "success 🟢",
+                "message": "Webhook configured!",
+                "bot": status_monitor.bot_username(),
+                "url": webhook_url
+            }
+        return JSONResponse({"status": "error 🔴"}, status_code=500)
+
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=500)
+
+@app.get('/status')
+async def status():
+    # Served from the cached snapshot only, safe for frequent health checks
+    webhook_info = status_monitor.value('webhook', {})
+    return {
+        "status": "FULLY ACTIVE 🟢",
+        "bot": status_monitor.bot_username(),
+        "webhook_url": webhook_info.get('url'),
+        "webhook_set": bool(webhook_info.get('url')),
+        **status_monitor.snapshot(),
+        "features": "Wallet, Transfers, Gifts, Contracts, Community, Settings"
+    }
+
+if __name__ == '__main__':
+    logger.info("🚀 Starting async SLH Bot...")
+    uvicorn.run(app, host='0.0.0.0', port=PORT)
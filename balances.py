@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import BALANCE_CACHE_TTL, BALANCE_CACHE_STALE, BALANCE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# keccak("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+
+
+def _key(token, address):
+    return (token.lower(), address.lower())
+
+
+class BalanceCache:
+    # Token balances keyed by (token, address). Entries younger than ttl are
+    # served from memory; up to ttl + stale they are still served while a
+    # single background refresh runs; older ones are loaded inline.
+    # Invalidation wins over loads that started before it, so a transfer is
+    # never hidden by an in-flight read of the old balance.
+    def __init__(self, ttl=BALANCE_CACHE_TTL, stale=BALANCE_CACHE_STALE, max_entries=BALANCE_CACHE_SIZE):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._invalidated = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='balance-refresh')
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    def get(self, token, address, load, fresh=False):
+        # fresh skips the cached value (but still stores the new one)
+        key = _key(token, address)
+        now = time.monotonic()
+        with self._lock:
+            entry = None if fresh else self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return value
+                if age < self.ttl + self.stale:
+                    self.stale_hits += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        self._executor.submit(self._refresh, key, load)
+                    return value
+            self.misses += 1
+        value = load()
+        self._store(key, value, now)
+        return value
+
+    def _refresh(self, key, load):
+        started = time.monotonic()
+        try:
+            self._store(key, load(), started)
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            # Keep serving the stale value until it expires
+            with self._lock:
+                self.errors += 1
+            logger.warning(f"Balance refresh failed for {key[1]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store(self, key, value, started):
+        with self._lock:
+            if started < self._invalidated.get(key, 0):
+                return
+            self._entries[key] = (value, started)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def put(self, token, address, value):
+        self._store(_key(token, address), value, time.monotonic())
+
+    def invalidate(self, token, address):
+        key = _key(token, address)
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._invalidated[key] = now
+            self.invalidations += 1
+            if len(self._invalidated) > self.max_entries:
+                # Only loads still running can be older than an invalidation
+                horizon = now - (self.ttl + self.stale)
+                self._invalidated = {k: t for k, t in self._invalidated.items() if t > horizon}
+
+    def on_transfer(self, token, from_address, to_address):
+        self.invalidate(token, from_address)
+        self.invalidate(token, to_address)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "stale": self.stale,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "hit_ratio": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0,
+                "refreshes": self.refreshes,
+                "errors": self.errors,
+                "invalidations": self.invalidations,
+            }
+
+
+balance_cache = BalanceCache()
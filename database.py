@@ -0,0 +1,256 @@
+import threading
+from collections import OrderedDict
+from config import USER_CACHE_SIZE
+from migrations import migrate_sqlite
+from storage import SQLiteEngine
+
+USER_COLUMNS = (
+    'user_id', 'username', 'first_name', 'last_name', 'wallet_address', 'phone', 'website', 'materials',
+    'total_gifts_sent', 'total_gifts_received', 'joined_group', 'created_at'
+)
+USER_SELECT = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+
+UPSERT_USER = '''
+    INSERT INTO users (user_id, username, first_name, last_name) VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        username = excluded.username, first_name = excluded.first_name, last_name = excluded.last_name
+    WHERE users.username IS NOT excluded.username
+        OR users.first_name IS NOT excluded.first_name
+        OR users.last_name IS NOT excluded.last_name
+'''
+
+class UserRecord:
+    # One row of users, by name instead of position
+    __slots__ = USER_COLUMNS
+
+    def __init__(self, row):
+        for column, value in zip(USER_COLUMNS, row):
+            setattr(self, column, value)
+        self.joined_group = bool(self.joined_group)
+        self.total_gifts_sent = self.total_gifts_sent or 0
+        self.total_gifts_received = self.total_gifts_received or 0
+
+    def __repr__(self):
+        return f"UserRecord(user_id={self.user_id}, username={self.username!r}, wallet_address={self.wallet_address!r})"
+
+def _add_columns(conn, table, columns):
+    # Databases created before versioned migrations may already have them
+    existing = [row[1] for row in conn.execute(f'PRAGMA table_info({table})').fetchall()]
+    for column, kind in columns:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+
+def add_receipt_columns(conn):
+    _add_columns(conn, 'transactions', (('block_number', 'INTEGER'), ('gas_used', 'INTEGER'), ('settled_at', 'TIMESTAMP')))
+
+def add_nonce_columns(conn):
+    # Sender and nonce of a transfer: it is only dropped once that nonce is used by another transaction
+    _add_columns(conn, 'transactions', (('from_address', 'TEXT'), ('nonce', 'INTEGER')))
+
+# Schema of slh_platform.db (shared with main.py); append new versions, never edit applied ones
+MIGRATIONS = [
+    (1, 'initial schema', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            wallet_address TEXT,
+            phone TEXT,
+            website TEXT,
+            materials TEXT,
+            total_gifts_sent REAL DEFAULT 0,
+            total_gifts_received REAL DEFAULT 0,
+            joined_group BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS gifts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_user_id INTEGER,
+            to_user_id INTEGER,
+            amount REAL,
+            message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (from_user_id) REFERENCES users (user_id),
+            FOREIGN KEY (to_user_id) REFERENCES users (user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            from_user_id INTEGER,
+            to_user_id INTEGER,
+            amount REAL,
+            tx_hash TEXT,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (from_user_id) REFERENCES users (user_id),
+            FOREIGN KEY (to_user_id) REFERENCES users (user_id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS contracts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            creator_id INTEGER,
+            title TEXT,
+            description TEXT,
+            status TEXT DEFAULT 'active',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (creator_id) REFERENCES users (user_id)
+        )
+        ''',
+    ]),
+    (2, 'transaction receipt columns', [add_receipt_columns]),
+    (3, 'lookup indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_users_wallet_address ON users (wallet_address)',
+        'CREATE INDEX IF NOT EXISTS idx_gifts_from_user_id ON gifts (from_user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_gifts_to_user_id ON gifts (to_user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_tx_hash ON transactions (tx_hash)',
+        # Only the few rows the receipt tracker polls
+        "CREATE INDEX IF NOT EXISTS idx_transactions_pending ON transactions (id) WHERE status = 'pending'",
+    ]),
+    (4, 'transaction sender and nonce', [add_nonce_columns]),
+]
+
+class UserDatabase:
+    def __init__(self, path='slh_platform.db', cache_size=USER_CACHE_SIZE):
+        # WAL, per-thread read connections, group-committed writes
+        self.engine = SQLiteEngine(path)
+        # Read-through LRU of UserRecords by user_id. Writes drop or patch the
+        # entry after they commit; a load that overlapped any write is not
+        # cached, so a stale row can't be put back over a newer one.
+        self.cache_size = cache_size
+        self._users = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        migrate_sqlite(self.engine, 'slh_platform', MIGRATIONS)
+    
+    @property
+    def conn(self):
+        # Read connection of the calling thread, for ad-hoc queries
+        return self.engine.reader()
+    
+    def add_user(self, user_id, username, first_name, last_name):
+        # Also refreshes a returning user's Telegram names; unchanged rows are not rewritten
+        if self.engine.execute(UPSERT_USER, (user_id, username, first_name, last_name)):
+            self._patch(user_id)
+    
+    def add_users(self, users):
+        # Bulk add_user for imports and group member syncs, one transaction:
+        # (user_id, username, first_name, last_name) tuples
+        users = list(users)
+        self.engine.run(lambda conn: conn.executemany(UPSERT_USER, users))
+        for user in users:
+            self._patch(user[0])
+        return len(users)
+    
+    def update_wallet(self, user_id, wallet_address):
+        self.engine.execute('''
+            UPDATE users SET wallet_address = ? WHERE user_id = ?
+        ''', (wallet_address, user_id))
+        self._patch(user_id)
+    
+    def update_contact_info(self, user_id, phone, website, materials):
+        self.engine.execute('''
+            UPDATE users SET phone = ?, website = ?, materials = ? WHERE user_id = ?
+        ''', (phone, website, materials, user_id))
+        self._patch(user_id)
+    
+    def mark_joined_group(self, user_id):
+        self.engine.execute('''
+            UPDATE users SET joined_group = TRUE WHERE user_id = ?
+        ''', (user_id,))
+        self._patch(user_id, lambda record: setattr(record, 'joined_group', True))
+    
+    def _patch(self, user_id, change=None):
+        # After a committed write: apply change to the cached record, or drop it.
+        # Only idempotent changes are patched; anything else could be applied
+        # twice to a record loaded after the commit, or out of order.
+        with self._lock:
+            self._writes += 1
+            record = self._users.get(user_id)
+            if record is None:
+                return
+            if change is None:
+                del self._users[user_id]
+            else:
+                change(record)
+    
+    def get_user(self, user_id):
+        with self._lock:
+            record = self._users.get(user_id)
+            if record is not None:
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return record
+            self.misses += 1
+            writes = self._writes
+        row = self.engine.read_one(f'{USER_SELECT} WHERE user_id = ?', (user_id,))
+        if row is None:
+            return None
+        record = UserRecord(row)
+        with self._lock:
+            if writes == self._writes:
+                self._users[user_id] = record
+                while len(self._users) > self.cache_size:
+                    self._users.popitem(last=False)
+        return record
+    
+    def get_user_by_wallet(self, wallet_address):
+        row = self.engine.read_one(f'{USER_SELECT} WHERE wallet_address = ?', (wallet_address,))
+        return UserRecord(row) if row else None
+    
+    def get_wallet_addresses(self):
+        rows = self.engine.read('SELECT DISTINCT wallet_address FROM users WHERE wallet_address IS NOT NULL')
+        return [row[0] for row in rows]
+    
+    def add_gift(self, from_user_id, to_user_id, amount, message):
+        self.engine.write([
+            ('''
+                INSERT INTO gifts (from_user_id, to_user_id, amount, message)
+                VALUES (?, ?, ?, ?)
+            ''', (from_user_id, to_user_id, amount, message)),
+            ('''
+                UPDATE users SET total_gifts_sent = total_gifts_sent + ? WHERE user_id = ?
+            ''', (amount, from_user_id)),
+            ('''
+                UPDATE users SET total_gifts_received = total_gifts_received + ? WHERE user_id = ?
+            ''', (amount, to_user_id)),
+        ])
+        self._patch(from_user_id)
+        self._patch(to_user_id)
+    
+    def add_transaction(self, from_user_id, to_user_id, amount, tx_hash, status='pending', from_address=None, nonce=None):
+        self.engine.execute('''
+            INSERT INTO transactions (from_user_id, to_user_id, amount, tx_hash, status, from_address, nonce)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (from_user_id, to_user_id, amount, tx_hash, status, from_address, nonce))
+    
+    def get_pending_transactions(self):
+        # (id, from_user_id, amount, tx_hash, age in seconds, from_address, nonce) of transfers awaiting a receipt
+        return self.engine.read('''
+            SELECT id, from_user_id, amount, tx_hash, (julianday('now') - julianday(created_at)) * 86400, from_address, nonce
+            FROM transactions WHERE status = 'pending' AND tx_hash IS NOT NULL ORDER BY id
+        ''')
+    
+    def settle_transaction(self, tx_hash, status, block_number=None, gas_used=None):
+        self.engine.execute('''
+            UPDATE transactions SET status = ?, block_number = ?, gas_used = ?, settled_at = CURRENT_TIMESTAMP
+            WHERE tx_hash = ? AND status = 'pending'
+        ''', (status, block_number, gas_used, tx_hash))
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            users = {
+                "cached_users": len(self._users),
+                "user_hits": self.hits,
+                "user_misses": self.misses,
+                "user_hit_ratio": round(self.hits / lookups, 3) if lookups else 0,
+            }
+        return {**self.engine.stats(), **users}
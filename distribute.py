@@ -1,7 +1,278 @@
-from wallet import send_tokens
+import argparse
+import csv
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from web3 import Web3
+from config import DISTRIBUTION_DB_PATH, DISTRIBUTION_CONCURRENCY, DISPERSE_BATCH_SIZE
+from engine import init_db
+from wallet import send_tokens, send_tokens_disperse, transaction_known, rebroadcast, nonce_confirmed
 from history import log_action
 
+logger = logging.getLogger(__name__)
+
 def distribute_reward(telegram_id: int, user_address: str, amount_slh: float):
     tx = send_tokens(user_address, amount_slh)
     log_action(telegram_id, f"distribute {amount_slh} SLH to {user_address}", metadata=str(tx))
     return tx
+
+# ==================== BULK DISTRIBUTION ====================
+def load_recipients_csv(path, default_amount=None):
+    # address[,amount[,telegram_id]] per row; header and '#' rows are skipped
+    recipients = []
+    with open(path, newline='') as f:
+        for row in csv.reader(f):
+            if not row or not row[0].strip() or row[0].startswith('#'):
+                continue
+            if row[0].strip().lower() in ('address', 'wallet', 'wallet_address'):
+                continue
+            amount = float(row[1]) if len(row) > 1 and row[1].strip() else default_amount
+            telegram_id = int(row[2]) if len(row) > 2 and row[2].strip() else None
+            recipients.append((telegram_id, row[0].strip(), amount))
+    return recipients
+
+def recipients_from_query(conn, sql, params=()):
+    # Rows of (telegram_id, address, amount) from any sqlite3/DB-API connection,
+    # e.g. UserDatabase().conn and "SELECT user_id, wallet_address, 10 FROM users ..."
+    return [tuple(row) for row in conn.execute(sql, params).fetchall()]
+
+
+class DistributionJob:
+    # A payout to many recipients, checkpointed per recipient in SQLite.
+    # Each row goes pending -> sending (signed transaction, hash and nonce
+    # stored before broadcast) -> sent / failed. On resume the stored
+    # transaction itself is broadcast again, so whichever node saw the first
+    # broadcast can only mine that one; a row is paid anew only once a mined
+    # transaction has used its nonce and its own hash is still unknown, so a
+    # crash never double-pays.
+    def __init__(self, job_id, path=DISTRIBUTION_DB_PATH):
+        self.job_id = job_id
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS distribution_recipients (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                telegram_id INTEGER,
+                address TEXT NOT NULL,
+                amount REAL,
+                status TEXT NOT NULL,
+                tx_hash TEXT,
+                raw_tx TEXT,
+                nonce INTEGER,
+                error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (job_id, address)
+            )
+        ''')
+        # Job databases created before the signed transaction was kept
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(distribution_recipients)').fetchall()]
+        for column, kind in (('raw_tx', 'TEXT'), ('nonce', 'INTEGER')):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE distribution_recipients ADD COLUMN {column} {kind}')
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.sent_this_run = 0
+
+    @classmethod
+    def create(cls, recipients, job_id=None, path=DISTRIBUTION_DB_PATH):
+        # Validates and checksums everything before a single transfer is made
+        job = cls(job_id or uuid.uuid4().hex[:12], path)
+        seen = set()
+        rows = []
+        for position, (telegram_id, address, amount) in enumerate(recipients):
+            status, error = 'pending', None
+            address = (address or '').strip()
+            if not Web3.is_address(address):
+                status, error = 'invalid', 'invalid address'
+            else:
+                address = Web3.to_checksum_address(address)
+                if amount is None or amount <= 0:
+                    status, error = 'invalid', 'invalid amount'
+            if address in seen:
+                logger.warning(f"Duplicate recipient {address} in job {job.job_id}, paying it once")
+                continue
+            seen.add(address)
+            rows.append((job.job_id, position, telegram_id, address, amount, status, error, time.time()))
+        with job._lock:
+            job.conn.executemany('''
+                INSERT OR IGNORE INTO distribution_recipients
+                (job_id, position, telegram_id, address, amount, status, error, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            job.conn.commit()
+        return job
+
+    def _set(self, addresses, status, tx_hash=None, error=None):
+        with self._lock:
+            self.conn.executemany('''
+                UPDATE distribution_recipients SET status = ?, tx_hash = COALESCE(?, tx_hash), error = ?, updated_at = ?
+                WHERE job_id = ? AND address = ?
+            ''', [(status, tx_hash, error, time.time(), self.job_id, address) for address in addresses])
+            self.conn.commit()
+
+    def _signed(self, addresses, tx_hash, raw_tx, nonce):
+        # Checkpoint before broadcast: enough to send the very same transaction again
+        with self._lock:
+            self.conn.executemany('''
+                UPDATE distribution_recipients SET tx_hash = ?, raw_tx = ?, nonce = ?, updated_at = ?
+                WHERE job_id = ? AND address = ?
+            ''', [(tx_hash, raw_tx, nonce, time.time(), self.job_id, address) for address in addresses])
+            self.conn.commit()
+
+    def _rows(self, status):
+        with self._lock:
+            return self.conn.execute('''
+                SELECT telegram_id, address, amount, tx_hash FROM distribution_recipients
+                WHERE job_id = ? AND status = ? ORDER BY position
+            ''', (self.job_id, status)).fetchall()
+
+    def _resolve(self, tx_hash, raw_tx, nonce):
+        # Status for rows whose transaction was signed but maybe not broadcast;
+        # None leaves them as they are for a later resume
+        if transaction_known(tx_hash):
+            return 'sent'
+        if raw_tx is None:
+            logger.warning(f"Distribution {self.job_id}: {tx_hash} unknown and not stored, left for review")
+            return None
+        try:
+            if rebroadcast(raw_tx):
+                return 'sent'
+            # Nonce used: by this transaction (mined, the node just didn't find it), or by another one
+            if nonce is not None and nonce_confirmed(nonce) and not transaction_known(tx_hash):
+                return 'pending'
+        except Exception as e:
+            logger.warning(f"Distribution {self.job_id}: could not resolve {tx_hash}: {e}")
+        return None
+
+    def recover(self, retry_failed=False):
+        # Settle rows a previous run left mid-flight
+        statuses = ('sending', 'failed') if retry_failed else ('sending',)
+        with self._lock:
+            rows = self.conn.execute(f'''
+                SELECT address, tx_hash, raw_tx, nonce FROM distribution_recipients
+                WHERE job_id = ? AND status IN ({', '.join('?' for _ in statuses)})
+            ''', (self.job_id, *statuses)).fetchall()
+        unsigned = [address for address, tx_hash, _, _ in rows if not tx_hash]
+        if unsigned:
+            # Never signed, so never broadcast
+            self._set(unsigned, 'pending')
+        # A disperse batch shares one transaction
+        transactions = {}
+        for address, tx_hash, raw_tx, nonce in rows:
+            if tx_hash:
+                transactions.setdefault((tx_hash, raw_tx, nonce), []).append(address)
+        for (tx_hash, raw_tx, nonce), addresses in transactions.items():
+            status = self._resolve(tx_hash, raw_tx, nonce)
+            if status:
+                self._set(addresses, status, tx_hash if status == 'sent' else None)
+
+    def _pay(self, recipient):
+        telegram_id, address, amount, _ = recipient
+        self._set([address], 'sending')
+        result = send_tokens(address, amount, on_signed=lambda *signed: self._signed([address], *signed))
+        if isinstance(result, dict):
+            self._set([address], 'failed', error=result.get('error'))
+        else:
+            self._set([address], 'sent', result)
+            with self._lock:
+                self.sent_this_run += 1
+
+    def _pay_batch(self, recipients):
+        addresses = [address for _, address, _, _ in recipients]
+        self._set(addresses, 'sending')
+        result = send_tokens_disperse(
+            [(address, amount) for _, address, amount, _ in recipients],
+            on_signed=lambda *signed: self._signed(addresses, *signed)
+        )
+        if isinstance(result, dict):
+            self._set(addresses, 'failed', error=result.get('error'))
+        else:
+            self._set(addresses, 'sent', result)
+            with self._lock:
+                self.sent_this_run += len(addresses)
+
+    def run(self, concurrency=DISTRIBUTION_CONCURRENCY, disperse=False, batch_size=DISPERSE_BATCH_SIZE,
+            retry_failed=False, progress=None, progress_every=5):
+        self.recover(retry_failed)
+        pending = self._rows('pending')
+        if disperse:
+            work = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+            pay = self._pay_batch
+        else:
+            work = pending
+            pay = self._pay
+        self.started_at = time.monotonic()
+        self.sent_this_run = 0
+        logger.info(f"🚀 Distribution {self.job_id}: {len(pending)} recipients pending")
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"distribute-{self.job_id}") as pool:
+            futures = [pool.submit(pay, item) for item in work]
+            not_done = set(futures)
+            while not_done:
+                _, not_done = wait(not_done, timeout=progress_every)
+                if not not_done:
+                    break
+                report = self.stats()
+                logger.info(f"Distribution {self.job_id}: {report['sent']}/{report['total']} sent, "
+                            f"{report['per_second']}/s, eta {report['eta_seconds']}s")
+                if progress:
+                    progress(report)
+            for future in futures:
+                # Surface bugs in the worker itself, transfer errors are stored per row
+                future.result()
+        report = self.stats()
+        log_action(None, f"distribution {self.job_id}: {report['sent']} sent, {report['failed']} failed",
+                   metadata=str(report))
+        if progress:
+            progress(report)
+        return report
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.conn.execute('''
+                SELECT status, COUNT(*) FROM distribution_recipients WHERE job_id = ? GROUP BY status
+            ''', (self.job_id,)).fetchall())
+            amount = self.conn.execute('''
+                SELECT COALESCE(SUM(amount), 0) FROM distribution_recipients WHERE job_id = ? AND status = 'sent'
+            ''', (self.job_id,)).fetchone()[0]
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        rate = self.sent_this_run / elapsed if elapsed else 0
+        remaining = counts.get('pending', 0) + counts.get('sending', 0)
+        return {
+            "job_id": self.job_id,
+            "total": sum(counts.values()),
+            "pending": counts.get('pending', 0),
+            "sending": counts.get('sending', 0),
+            "sent": counts.get('sent', 0),
+            "failed": counts.get('failed', 0),
+            "invalid": counts.get('invalid', 0),
+            "amount_sent": amount,
+            "elapsed_seconds": round(elapsed, 1),
+            "per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate) if rate else None,
+        }
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Bulk SLH distribution")
+    parser.add_argument('recipients', nargs='?', help="CSV of address[,amount[,telegram_id]]")
+    parser.add_argument('--amount', type=float, help="amount for rows without one")
+    parser.add_argument('--job', help="job id; an existing job is resumed")
+    parser.add_argument('--concurrency', type=int, default=DISTRIBUTION_CONCURRENCY)
+    parser.add_argument('--disperse', action='store_true', help="pay through the disperse contract")
+    parser.add_argument('--retry-failed', action='store_true')
+    args = parser.parse_args()
+    # history table for the per-job log_action entries
+    init_db()
+    if args.recipients:
+        job = DistributionJob.create(load_recipients_csv(args.recipients, args.amount), args.job)
+    elif args.job:
+        job = DistributionJob(args.job)
+    else:
+        parser.error("give a recipients file or --job to resume")
+    print(job.run(args.concurrency, disperse=args.disperse, retry_failed=args.retry_failed))
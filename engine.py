@@ -0,0 +1,61 @@
+import importlib
+from sqlmodel import create_engine
+from config import (
+    DATABASE_URL, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_TIMEOUT,
+    DATABASE_POOL_RECYCLE, DATABASE_STATEMENT_TIMEOUT_MS
+)
+from migrations import migrate_sqlalchemy
+
+# Modules defining SQLModel tables; importing one registers its migrations
+MODEL_MODULES = ('users', 'store', 'history')
+
+_engines = {}
+_migrations = {}
+
+
+def make_engine(url=DATABASE_URL):
+    # One connection pool per database URL per process, shared by every model
+    # module. Sized explicitly so replicas * (pool_size + max_overflow) stays
+    # under the server's connection limit; pre-ping drops connections the
+    # server closed while idle.
+    if url.startswith('postgres://'):
+        # Heroku/Railway style URLs, which SQLAlchemy no longer accepts
+        url = 'postgresql://' + url[len('postgres://'):]
+    if url not in _engines:
+        options = {'echo': False, 'pool_pre_ping': True}
+        if url.startswith('postgresql'):
+            options.update(
+                pool_size=DATABASE_POOL_SIZE,
+                max_overflow=DATABASE_MAX_OVERFLOW,
+                pool_timeout=DATABASE_POOL_TIMEOUT,
+                pool_recycle=DATABASE_POOL_RECYCLE,
+                connect_args={'options': f'-c statement_timeout={DATABASE_STATEMENT_TIMEOUT_MS}'}
+            )
+        _engines[url] = create_engine(url, **options)
+    return _engines[url]
+
+
+def register_migrations(component, migrations):
+    # Called by each model module at import
+    _migrations[component] = migrations
+
+
+def init_db(engine=None):
+    # Creates and migrates the tables of every model module; run once at startup
+    for module in MODEL_MODULES:
+        importlib.import_module(module)
+    engine = engine or make_engine()
+    return {component: migrate_sqlalchemy(engine, component, migrations) for component, migrations in _migrations.items()}
+
+
+def pool_stats(engine=None):
+    pool = (engine or make_engine()).pool
+    if not hasattr(pool, 'checkedout'):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+    }
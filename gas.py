@@ -0,0 +1,132 @@
+import logging
+import statistics
+import threading
+import time
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from config import (
+    GAS_PRICE_BLOCKS, GAS_PRICE_PERCENTILE, GAS_PRICE_REFRESH,
+    GAS_PRICE_MIN_GWEI, GAS_PRICE_MAX_GWEI, GAS_LIMIT_MARGIN
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionWouldFail(Exception):
+    pass
+
+
+class GasOracle:
+    # Gas price from the priority fees actually paid in recent blocks
+    # (eth_feeHistory percentile + next base fee), refreshed in the background
+    # and clamped to [min, max] so a spike can't make us overpay wildly.
+    # Falls back to eth_gasPrice on nodes without fee history.
+    def __init__(self, w3, blocks=GAS_PRICE_BLOCKS, percentile=GAS_PRICE_PERCENTILE, interval=GAS_PRICE_REFRESH,
+                 min_gwei=GAS_PRICE_MIN_GWEI, max_gwei=GAS_PRICE_MAX_GWEI):
+        self.w3 = w3
+        self.blocks = blocks
+        self.percentile = percentile
+        self.interval = interval
+        self.min_price = Web3.to_wei(min_gwei, 'gwei')
+        self.max_price = Web3.to_wei(max_gwei, 'gwei')
+        self._price = None
+        self.updated_at = None
+        self.source = None
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _fetch(self):
+        try:
+            history = self.w3.eth.fee_history(self.blocks, 'latest', [self.percentile])
+            rewards = [reward[0] for reward in history['reward'] if reward]
+            base_fee = history['baseFeePerGas'][-1] if history.get('baseFeePerGas') else 0
+            if not rewards:
+                raise ValueError("empty fee history")
+            price, source = base_fee + int(statistics.median(rewards)), 'fee_history'
+        except Exception as e:
+            logger.debug(f"Fee history unavailable, using eth_gasPrice: {e}")
+            price, source = self.w3.eth.gas_price, 'gas_price'
+        return min(max(price, self.min_price), self.max_price), source
+
+    def refresh(self):
+        price, source = self._fetch()
+        with self._lock:
+            self._price = price
+            self.source = source
+            self.updated_at = time.time()
+        return price
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Gas price refresh failed: {e}")
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='gas-oracle', daemon=True)
+        self._thread.start()
+
+    def price(self):
+        if self._price is None:
+            self.refresh()
+            self.start()
+        return self._price
+
+    def stats(self):
+        return {
+            "gas_price_gwei": float(Web3.from_wei(self._price, 'gwei')) if self._price is not None else None,
+            "source": self.source,
+            "updated_at": int(self.updated_at) if self.updated_at else None,
+            "errors": self.errors,
+        }
+
+
+class GasEstimator:
+    # estimateGas once per call shape (contract, function, caller-supplied
+    # variant such as "recipient already holds tokens") plus a safety margin,
+    # and an eth_call pre-flight so transfers that would revert are refused
+    # before any gas is paid.
+    def __init__(self, w3, margin=GAS_LIMIT_MARGIN):
+        self.w3 = w3
+        self.margin = margin
+        self._estimates = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def simulate(self, function, sender):
+        try:
+            result = function.call({'from': sender})
+        except ContractLogicError as e:
+            self.rejected += 1
+            raise TransactionWouldFail(f"Transaction would revert: {e}")
+        if result is False:
+            # ERC-20s that signal failure by returning false
+            self.rejected += 1
+            raise TransactionWouldFail("Transaction would fail: call returned false")
+        return result
+
+    def estimate(self, function, sender, shape=()):
+        key = (function.address, function.fn_name) + tuple(shape)
+        with self._lock:
+            gas = self._estimates.get(key)
+            if gas is not None:
+                self.hits += 1
+        if gas is None:
+            gas = function.estimate_gas({'from': sender})
+            with self._lock:
+                self.misses += 1
+                self._estimates[key] = max(gas, self._estimates.get(key, 0))
+        return int(gas * self.margin)
+
+    def stats(self):
+        with self._lock:
+            return {"shapes": len(self._estimates), "hits": self.hits, "misses": self.misses, "rejected": self.rejected}
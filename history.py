@@ -1,7 +1,7 @@
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, Session, select
 from typing import Optional
 from datetime import datetime
-from config import DATABASE_URL
+from engine import make_engine, register_migrations
 
 class History(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -10,10 +10,18 @@ class History(SQLModel, table=True):
     metadata: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-engine = create_engine(DATABASE_URL, echo=False)
+engine = make_engine()
 
-def init_db():
-    SQLModel.metadata.create_all(engine)
+# Append new versions, never edit applied ones
+MIGRATIONS = [
+    (1, 'history table', [lambda conn: History.__table__.create(conn, checkfirst=True)]),
+    (2, 'telegram_id and created_at indexes', [
+        'CREATE INDEX IF NOT EXISTS ix_history_telegram_id ON history (telegram_id)',
+        'CREATE INDEX IF NOT EXISTS ix_history_created_at ON history (created_at)',
+    ]),
+]
+
+register_migrations('history', MIGRATIONS)
 
 def log_action(telegram_id: int, action: str, metadata: str = None):
     with Session(engine) as s:
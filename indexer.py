@@ -0,0 +1,327 @@
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+from web3 import Web3
+from balances import TRANSFER_TOPIC
+from config import (
+    SLH_TOKEN_ADDRESS, TRANSFER_INDEX_PATH, TRANSFER_INDEX_START_BLOCK, TRANSFER_INDEX_CONFIRMATIONS,
+    TRANSFER_INDEX_CHUNK, TRANSFER_INDEX_MAX_CHUNK
+)
+from tokens import token_registry
+
+logger = logging.getLogger(__name__)
+
+# get_logs errors meaning the range held too many logs, not that the node is down or
+# throttling us ("rate limit exceeded", "too many requests" must not shrink the chunk)
+TOO_MANY_RESULTS = ('returned more than', 'too many results', 'too many logs', 'block range', 'range limit',
+                    'range is too large', 'response size')
+
+
+def is_too_many_results(error):
+    message = str(error).lower()
+    return any(text in message for text in TOO_MANY_RESULTS)
+
+
+def _topic_address(topic):
+    # Indexed address topics are left-padded to 32 bytes
+    return '0x' + bytes(topic)[-20:].hex()
+
+
+class TransferIndexer:
+    # Transfer logs of one token copied into SQLite, so balances, histories
+    # and volume come from a local query instead of the RPC. Backfills with
+    # eth_getLogs in block chunks that halve when the node says a range holds
+    # too many results and grow back after a run of successes, then follows
+    # the head. The hash of each indexed tip inside the last `confirmations`
+    # blocks is kept; when the chain no longer has one, everything above the
+    # newest surviving tip is dropped and indexed again.
+    def __init__(self, w3, token=SLH_TOKEN_ADDRESS, path=TRANSFER_INDEX_PATH, start_block=TRANSFER_INDEX_START_BLOCK,
+                 confirmations=TRANSFER_INDEX_CONFIRMATIONS, chunk=TRANSFER_INDEX_CHUNK,
+                 max_chunk=TRANSFER_INDEX_MAX_CHUNK, cache=None):
+        self.w3 = w3
+        self.token = Web3.to_checksum_address(token)
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.chunk = chunk
+        self.max_chunk = max_chunk
+        # balance cache to invalidate for transfers found while following the head
+        self.cache = cache
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS token_transfers (
+                token TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                log_index INTEGER NOT NULL,
+                tx_hash TEXT NOT NULL,
+                from_address TEXT NOT NULL,
+                to_address TEXT NOT NULL,
+                value TEXT NOT NULL,
+                amount REAL NOT NULL,
+                PRIMARY KEY (token, block_number, log_index)
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_token_transfers_from ON token_transfers (token, from_address)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_token_transfers_to ON token_transfers (token, to_address)')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS transfer_index_tips (
+                token TEXT NOT NULL,
+                block_number INTEGER NOT NULL,
+                block_hash TEXT NOT NULL,
+                PRIMARY KEY (token, block_number)
+            )
+        ''')
+        self.conn.commit()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.head = None
+        self.last_block = self.conn.execute(
+            'SELECT MAX(block_number) FROM transfer_index_tips WHERE token = ?', (self.token,)
+        ).fetchone()[0]
+        # Row count kept up to date by _store and _rollback, so stats() never scans the table
+        self.transfers = self.conn.execute(
+            'SELECT COUNT(*) FROM token_transfers WHERE token = ?', (self.token,)
+        ).fetchone()[0]
+        self._streak = 0
+        self.requests = 0
+        self.shrinks = 0
+        self.reorgs = 0
+        self.errors = 0
+
+    def _get_logs(self, from_block, to_block):
+        self.requests += 1
+        return self.w3.eth.get_logs({
+            'address': self.token,
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'topics': [TRANSFER_TOPIC],
+        })
+
+    def _rows(self, logs, decimals):
+        rows = []
+        for log in logs:
+            topics = log['topics']
+            if len(topics) < 3:
+                continue
+            data = log['data']
+            if isinstance(data, str):
+                data = bytes.fromhex(data[2:])
+            value = int.from_bytes(bytes(data)[:32], 'big')
+            rows.append((
+                self.token, log['blockNumber'], log['logIndex'], Web3.to_hex(log['transactionHash']),
+                _topic_address(topics[1]), _topic_address(topics[2]), str(value), value / (10 ** decimals)
+            ))
+        return rows
+
+    def _range_count(self, rows):
+        # Rows already stored in the blocks of `rows`; a primary key range scan
+        if not rows:
+            return 0
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM token_transfers WHERE token = ? AND block_number BETWEEN ? AND ?',
+            (self.token, rows[0][1], rows[-1][1])
+        ).fetchone()[0]
+
+    def _store(self, rows, tip, tip_hash):
+        with self._lock:
+            # A replaced row must not be counted twice
+            before = self._range_count(rows)
+            self.conn.executemany('''
+                INSERT OR REPLACE INTO token_transfers
+                (token, block_number, log_index, tx_hash, from_address, to_address, value, amount)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            added = self._range_count(rows) - before
+            self.conn.execute(
+                'INSERT OR REPLACE INTO transfer_index_tips (token, block_number, block_hash) VALUES (?, ?, ?)',
+                (self.token, tip, tip_hash)
+            )
+            # Tips older than the confirmation window can't be reorged any more; keep the newest
+            self.conn.execute(
+                'DELETE FROM transfer_index_tips WHERE token = ? AND block_number < ? AND block_number < ?',
+                (self.token, tip - self.confirmations, tip)
+            )
+            self.conn.commit()
+            self.transfers += added
+            self.last_block = tip
+
+    def _rollback(self, block_number):
+        # Forget everything above block_number
+        with self._lock:
+            touched = self.conn.execute('''
+                SELECT from_address, to_address FROM token_transfers WHERE token = ? AND block_number > ?
+            ''', (self.token, block_number)).fetchall()
+            removed = self.conn.execute(
+                'DELETE FROM token_transfers WHERE token = ? AND block_number > ?', (self.token, block_number)
+            ).rowcount
+            self.conn.execute('DELETE FROM transfer_index_tips WHERE token = ? AND block_number > ?', (self.token, block_number))
+            self.conn.commit()
+            self.transfers -= removed
+            self.last_block = block_number
+        self.reorgs += 1
+        logger.warning(f"Transfer index for {self.token} rolled back to block {block_number} after a reorg")
+        if self.cache:
+            for from_address, to_address in touched:
+                self.cache.on_transfer(self.token, from_address, to_address)
+
+    def check_reorg(self):
+        # Walk back the recorded tips until one is still on the chain
+        with self._lock:
+            tips = self.conn.execute('''
+                SELECT block_number, block_hash FROM transfer_index_tips WHERE token = ? ORDER BY block_number DESC
+            ''', (self.token,)).fetchall()
+        for block_number, block_hash in tips:
+            if Web3.to_hex(self.w3.eth.get_block(block_number)['hash']) == block_hash:
+                if block_number < self.last_block:
+                    self._rollback(block_number)
+                return
+        if tips:
+            # Reorg deeper than the window: index the whole window again
+            self._rollback(tips[-1][0] - self.confirmations - 1)
+
+    def _index_range(self, from_block, to_block):
+        # Returns the last block indexed, which may be short of to_block after a shrink
+        decimals = token_registry.decimals(self.w3, self.token)
+        while True:
+            end = min(from_block + self.chunk - 1, to_block)
+            # Before the logs: a reorg in between then leaves a stale tip that check_reorg
+            # catches, instead of a current tip stored next to logs of the old fork
+            tip_hash = Web3.to_hex(self.w3.eth.get_block(end)['hash'])
+            try:
+                logs = self._get_logs(from_block, end)
+            except Exception as e:
+                if not is_too_many_results(e) or self.chunk == 1:
+                    raise
+                self.chunk = max(self.chunk // 2, 1)
+                self._streak = 0
+                self.shrinks += 1
+                logger.info(f"Transfer index chunk for {self.token} reduced to {self.chunk} blocks")
+                continue
+            if any(log['blockNumber'] == end and Web3.to_hex(log['blockHash']) != tip_hash for log in logs):
+                raise RuntimeError(f"Block {end} changed while indexing it, retrying")
+            self._streak += 1
+            if self._streak >= 10 and self.chunk < self.max_chunk:
+                self.chunk = min(self.chunk * 2, self.max_chunk)
+                self._streak = 0
+            rows = self._rows(logs, decimals)
+            self._store(rows, end, tip_hash)
+            if self.cache and self.head is not None and end > self.head - self.max_chunk:
+                # Live transfers, not history
+                for row in rows:
+                    self.cache.on_transfer(self.token, row[4], row[5])
+            return end
+
+    def sync(self):
+        # Index up to the current head; returns the number of blocks covered
+        head = self.w3.eth.block_number
+        self.head = head
+        if self.last_block is None:
+            start = self.start_block if self.start_block is not None else head
+            self.last_block = start - 1
+        else:
+            self.check_reorg()
+        covered = 0
+        while self.last_block < head:
+            first = self.last_block + 1
+            covered += self._index_range(first, head) - first + 1
+        return covered
+
+    def _loop(self, interval):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Transfer indexer error: {e}")
+            time.sleep(interval)
+
+    def start(self, interval):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name='transfer-indexer', daemon=True)
+        self._thread.start()
+
+    def _safe_block(self, confirmed):
+        # Highest block to count; unconfirmed blocks may still be rolled back
+        last = self.last_block if self.last_block is not None else -1
+        if confirmed and self.head is not None:
+            return min(last, self.head - self.confirmations)
+        return last
+
+    def balance(self, address, confirmed=False):
+        # Only complete when the index starts at the token's deployment block
+        address = address.lower()
+        with self._lock:
+            rows = self.conn.execute('''
+                SELECT from_address, to_address, value FROM token_transfers
+                WHERE token = ? AND (to_address = ? OR from_address = ?) AND block_number <= ?
+            ''', (self.token, address, address, self._safe_block(confirmed))).fetchall()
+        # Exact integer sums of the raw values; the REAL amounts would add up rounding errors
+        total = 0
+        for from_address, to_address, value in rows:
+            if to_address == address:
+                total += int(value)
+            if from_address == address:
+                total -= int(value)
+        return total / (10 ** token_registry.decimals(self.w3, self.token))
+
+    def history(self, address, limit=20, before_block=None):
+        # Newest first: (block_number, tx_hash, from_address, to_address, amount)
+        address = address.lower()
+        before_block = before_block if before_block is not None else self._safe_block(False) + 1
+        with self._lock:
+            return self.conn.execute('''
+                SELECT block_number, tx_hash, from_address, to_address, amount FROM (
+                    SELECT block_number, log_index, tx_hash, from_address, to_address, amount FROM token_transfers
+                    WHERE token = ? AND from_address = ? AND block_number < ?
+                    UNION
+                    SELECT block_number, log_index, tx_hash, from_address, to_address, amount FROM token_transfers
+                    WHERE token = ? AND to_address = ? AND block_number < ?
+                ) ORDER BY block_number DESC, log_index DESC LIMIT ?
+            ''', (self.token, address, before_block, self.token, address, before_block, limit)).fetchall()
+
+    def volume(self, from_block=0, to_block=None):
+        to_block = to_block if to_block is not None else self._safe_block(False)
+        with self._lock:
+            transfers, senders, receivers = self.conn.execute('''
+                SELECT COUNT(*), COUNT(DISTINCT from_address), COUNT(DISTINCT to_address)
+                FROM token_transfers WHERE token = ? AND block_number BETWEEN ? AND ?
+            ''', (self.token, from_block, to_block)).fetchone()
+            values = self.conn.execute(
+                'SELECT value FROM token_transfers WHERE token = ? AND block_number BETWEEN ? AND ?',
+                (self.token, from_block, to_block)
+            ).fetchall()
+        amount = sum(int(value) for value, in values) / (10 ** token_registry.decimals(self.w3, self.token))
+        return {"transfers": transfers, "amount": amount, "senders": senders, "receivers": receivers}
+
+    def stats(self):
+        return {
+            "last_block": self.last_block,
+            "head": self.head,
+            "behind": self.head - self.last_block if self.head is not None and self.last_block is not None else None,
+            "transfers": self.transfers,
+            "chunk": self.chunk,
+            "requests": self.requests,
+            "shrinks": self.shrinks,
+            "reorgs": self.reorgs,
+            "errors": self.errors,
+        }
+
+
+if __name__ == '__main__':
+    from rpc import make_web3
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Index SLH Transfer logs into SQLite")
+    parser.add_argument('--from-block', type=int, default=TRANSFER_INDEX_START_BLOCK,
+                        help="first block for a new index, e.g. the token's deployment block")
+    parser.add_argument('--follow', type=int, metavar='SECONDS', help="keep following the head")
+    args = parser.parse_args()
+    indexer = TransferIndexer(make_web3(), start_block=args.from_block)
+    indexer.sync()
+    print(indexer.stats())
+    if args.follow:
+        indexer.start(args.follow)
+        while True:
+            time.sleep(3600)
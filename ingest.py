@@ -0,0 +1,474 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Policies applied when the queue is full:
+#   reject - tell the caller to answer non-2xx so Telegram redelivers later
+#   shed   - ack the webhook anyway and drop the update
+QUEUE_POLICIES = ('reject', 'shed')
+
+# Outcomes of UpdateQueue.offer
+ACCEPTED = 'accepted'
+SHED = 'shed'
+REJECTED = 'rejected'
+
+_STOP = object()
+
+SEEN_UPDATES_TABLE = 'CREATE TABLE IF NOT EXISTS seen_updates (update_id INTEGER PRIMARY KEY)'
+# Head of a chat's deque while the chat is claimed for processing outside the queue
+_CLAIMED = object()
+
+
+def update_chat_id(payload):
+    # Chat the raw update belongs to, used to keep one chat's updates in order
+    for field in ('message', 'edited_message', 'channel_post', 'edited_channel_post',
+                  'my_chat_member', 'chat_member', 'chat_join_request'):
+        obj = payload.get(field)
+        if obj and obj.get('chat'):
+            return obj['chat'].get('id')
+    query = payload.get('callback_query')
+    if query:
+        if query.get('message') and query['message'].get('chat'):
+            return query['message']['chat'].get('id')
+        return (query.get('from') or {}).get('id')
+    for field in ('inline_query', 'chosen_inline_result', 'shipping_query', 'pre_checkout_query'):
+        obj = payload.get(field)
+        if obj and obj.get('from'):
+            return obj['from'].get('id')
+    answer = payload.get('poll_answer')
+    if answer and answer.get('user'):
+        return answer['user'].get('id')
+    return None
+
+
+class UpdateQueue:
+    # Updates sharing a key (chat id) run strictly in order, one at a time;
+    # different keys run in parallel across the worker pool. Updates without
+    # a key are not ordered against anything.
+    def __init__(self, handler, workers=4, maxsize=1000, policy='reject', name='updates', key_func=update_chat_id):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.handler = handler
+        self.workers = workers
+        self.maxsize = maxsize
+        self.policy = policy
+        self.name = name
+        self.key_func = key_func
+        self._ready = queue.Queue()
+        self._pending = {}
+        self._size = 0
+        self._threads = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._running = False
+        self.submitted = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.shed = 0
+        self.in_flight = 0
+        self.max_depth = 0
+        self.max_chats = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        logger.info(f"✅ {self.name} queue started ({self.workers} workers, maxsize {self.maxsize}, policy {self.policy})")
+
+    def stop(self, timeout=5):
+        if not self._running:
+            return
+        self._running = False
+        for _ in self._threads:
+            self._ready.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, payload, force=False):
+        # Returns True when the update was accepted (or shed) and the webhook
+        # may answer 200, False when the caller should answer 503.
+        # force skips the size limit, for replaying already accepted updates.
+        return self.offer(payload, force) != REJECTED
+
+    def offer(self, payload, force=False):
+        # Like submit, but says whether the update was queued, shed or rejected
+        key = None
+        if self.key_func:
+            try:
+                key = self.key_func(payload)
+            except Exception as e:
+                logger.error(f"{self.name} key error: {e}")
+        item = (time.monotonic(), payload)
+        with self._lock:
+            if self._size >= self.maxsize and not force:
+                if self.policy == 'shed':
+                    self.shed += 1
+                else:
+                    self.rejected += 1
+                full = True
+            else:
+                full = False
+                self._size += 1
+                self.submitted += 1
+                if self._size > self.max_depth:
+                    self.max_depth = self._size
+                if key is None:
+                    self._ready.put((None, item))
+                elif key in self._pending:
+                    # A worker owns this chat already and will pick it up in order
+                    self._pending[key].append(item)
+                else:
+                    self._pending[key] = deque([item])
+                    self._ready.put((key, None))
+                    if len(self._pending) > self.max_chats:
+                        self.max_chats = len(self._pending)
+        if full:
+            logger.warning(f"{self.name} queue full ({self.maxsize}), policy {self.policy}")
+            return SHED if self.policy == 'shed' else REJECTED
+        return ACCEPTED
+
+    def has_pending(self, key):
+        with self._lock:
+            return key in self._pending
+
+    def claim(self, key):
+        # Reserves an idle chat for the caller to process an update itself.
+        # False if the chat has queued or running updates; otherwise updates
+        # submitted for it wait until release(key), like behind a worker.
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending[key] = deque([_CLAIMED])
+            return True
+
+    def release(self, key):
+        with self._lock:
+            items = self._pending[key]
+            items.popleft()
+            if items:
+                self._ready.put((key, None))
+            else:
+                del self._pending[key]
+
+    def wait_idle(self, timeout=None):
+        # Blocks until everything submitted so far has been processed
+        with self._idle:
+            return self._idle.wait_for(lambda: self._size == 0, timeout)
+
+    def _worker(self):
+        while True:
+            token = self._ready.get()
+            if token is _STOP:
+                return
+            key, item = token
+            if key is not None:
+                with self._lock:
+                    item = self._pending[key][0]
+            self._run(item)
+            with self._lock:
+                self._size -= 1
+                if not self._size:
+                    self._idle.notify_all()
+                if key is not None:
+                    items = self._pending[key]
+                    items.popleft()
+                    if items:
+                        # Requeue instead of draining so one busy chat can't starve the rest
+                        self._ready.put((key, None))
+                    else:
+                        del self._pending[key]
+
+    def _run(self, item):
+        enqueued_at, payload = item
+        started = time.monotonic()
+        with self._lock:
+            self.in_flight += 1
+            self.total_wait += started - enqueued_at
+        ok = True
+        try:
+            self.handler(payload)
+        except Exception as e:
+            ok = False
+            logger.error(f"{self.name} worker error: {e}")
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.total_run += time.monotonic() - started
+                if ok:
+                    self.processed += 1
+                else:
+                    self.failed += 1
+
+    def stats(self):
+        with self._lock:
+            done = self.processed + self.failed
+            return {
+                "workers": self.workers,
+                "policy": self.policy,
+                "depth": self._size,
+                "maxsize": self.maxsize,
+                "max_depth": self.max_depth,
+                "active_chats": len(self._pending),
+                "max_chats": self.max_chats,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "processed": self.processed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "shed": self.shed,
+                "avg_wait_ms": round(self.total_wait / done * 1000, 2) if done else 0,
+                "avg_run_ms": round(self.total_run / done * 1000, 2) if done else 0,
+            }
+
+
+class UpdatePoller:
+    # Long-polling getUpdates as an alternative to the webhook. Every update of
+    # a batch goes through `accept`; the offset confirming the batch to Telegram
+    # is only sent with the next request, once `wait` reports the batch
+    # processed, so whatever was in flight during a crash is delivered again.
+    def __init__(self, fetch, accept, wait=None, limit=100, timeout=50, name='poller'):
+        self.fetch = fetch
+        self.accept = accept
+        self.wait = wait
+        self.limit = limit
+        self.timeout = timeout
+        self.name = name
+        self.offset = None
+        self._thread = None
+        self._running = False
+        self.polls = 0
+        self.received = 0
+        self.errors = 0
+        self.max_batch = 0
+        self.last_batch_at = None
+
+    def poll_once(self):
+        updates = self.fetch(self.offset, self.limit, self.timeout)
+        self.polls += 1
+        for payload in updates:
+            self.accept(payload)
+        if updates:
+            if self.wait:
+                self.wait()
+            self.offset = updates[-1]['update_id'] + 1
+            self.received += len(updates)
+            self.max_batch = max(self.max_batch, len(updates))
+            self.last_batch_at = time.time()
+        return len(updates)
+
+    def _loop(self):
+        backoff = 1
+        while self._running:
+            try:
+                self.poll_once()
+                backoff = 1
+            except Exception as e:
+                # The batch is not confirmed; accepted updates come back and are deduplicated
+                self.errors += 1
+                logger.error(f"{self.name} error: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        logger.info(f"✅ {self.name} started (batch {self.limit}, timeout {self.timeout}s)")
+
+    def stop(self, timeout=None):
+        if not self._running:
+            return
+        self._running = False
+        self._thread.join(self.timeout + 5 if timeout is None else timeout)
+        self._thread = None
+        if self.offset is not None:
+            try:
+                # Confirm the last processed batch without waiting for new updates
+                self.fetch(self.offset, 1, 0)
+            except Exception as e:
+                logger.error(f"{self.name} could not confirm offset {self.offset}: {e}")
+
+    def stats(self):
+        return {
+            "offset": self.offset,
+            "batch_limit": self.limit,
+            "timeout": self.timeout,
+            "polls": self.polls,
+            "received": self.received,
+            "max_batch": self.max_batch,
+            "errors": self.errors,
+            "last_batch_at": int(self.last_batch_at) if self.last_batch_at else None,
+        }
+
+
+class UpdateSpool:
+    # Append-only log of raw webhook bodies in SQLite (WAL). An update is
+    # appended before the webhook is acked and deleted once processed, so
+    # whatever is left after a crash is replayed in order on startup.
+    def __init__(self, path='webhook_spool.db', synchronous='NORMAL'):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # NORMAL survives process crashes; FULL also survives power loss
+        self.conn.execute(f'PRAGMA synchronous={synchronous}')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        ''')
+        self._lock = threading.Lock()
+        self._depth = self.conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+        self.appended = 0
+        self.acked = 0
+        self.replayed = 0
+
+    def append(self, raw, update_id=None):
+        # With update_id, its UpdateDeduplicator row (same database file) is
+        # committed together with the entry: a crash can lose neither alone
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                cursor = self.conn.execute(
+                    'INSERT INTO spool (payload, created_at) VALUES (?, ?)', (raw, time.time())
+                )
+                if update_id is not None:
+                    self.conn.execute(SEEN_UPDATES_TABLE)
+                    self.conn.execute('INSERT OR IGNORE INTO seen_updates (update_id) VALUES (?)', (update_id,))
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.appended += 1
+            self._depth += 1
+            return cursor.lastrowid
+
+    def ack(self, spool_id):
+        with self._lock:
+            self.conn.execute('DELETE FROM spool WHERE id = ?', (spool_id,))
+            self.acked += 1
+            self._depth -= 1
+
+    def pending(self):
+        with self._lock:
+            rows = self.conn.execute('SELECT id, payload FROM spool ORDER BY id').fetchall()
+        return [(spool_id, json.loads(raw)) for spool_id, raw in rows]
+
+    def replay(self, update_queue):
+        # Hand every unprocessed update back to the queue, oldest first
+        entries = self.pending()
+        for entry in entries:
+            update_queue.submit(entry, force=True)
+        self.replayed += len(entries)
+        if entries:
+            logger.info(f"♻️ Replayed {len(entries)} spooled updates")
+        return len(entries)
+
+    def depth(self):
+        return self._depth
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "depth": self.depth(),
+            "appended": self.appended,
+            "acked": self.acked,
+            "replayed": self.replayed,
+        }
+
+
+def spooled_chat_id(entry):
+    return update_chat_id(entry[1])
+
+
+class UpdateDeduplicator:
+    # Remembers the last `size` update_ids in a ring buffer + dict so webhook
+    # retries are recognised in O(1). With a path the window is also kept in
+    # SQLite and reloaded on startup.
+    def __init__(self, size=10000, path=None):
+        self.size = size
+        self.path = path
+        self._ring = [None] * size
+        self._slots = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.conn = None
+        self.duplicates = 0
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.execute(SEEN_UPDATES_TABLE)
+            rows = self.conn.execute(
+                'SELECT update_id FROM seen_updates ORDER BY rowid DESC LIMIT ?', (size,)
+            ).fetchall()
+            for (update_id,) in reversed(rows):
+                self._remember(update_id)
+
+    def _remember(self, update_id):
+        evicted = self._ring[self._next]
+        if evicted is not None and self._slots.get(evicted) == self._next:
+            del self._slots[evicted]
+        self._ring[self._next] = update_id
+        self._slots[update_id] = self._next
+        self._next = (self._next + 1) % self.size
+
+    def seen(self, update_id, persist=True):
+        # True if update_id was already accepted, otherwise records it. With
+        # persist=False only in memory: the caller persists it with record(),
+        # or with UpdateSpool.append, once the update itself is durable
+        if update_id is None:
+            return False
+        with self._lock:
+            if update_id in self._slots:
+                self.duplicates += 1
+                return True
+            self._remember(update_id)
+            if self.conn:
+                if persist:
+                    self.conn.execute('INSERT OR IGNORE INTO seen_updates (update_id) VALUES (?)', (update_id,))
+                if self._next == 0:
+                    # Once per lap, drop rows that fell out of the window
+                    self.conn.execute(
+                        'DELETE FROM seen_updates WHERE update_id < ?', (min(self._slots),)
+                    )
+            return False
+
+    def record(self, update_id):
+        # Persists an update_id taken with seen(update_id, persist=False)
+        if update_id is None or not self.conn:
+            return
+        with self._lock:
+            self.conn.execute('INSERT OR IGNORE INTO seen_updates (update_id) VALUES (?)', (update_id,))
+
+    def forget(self, update_id):
+        # Undo seen() for an update we did not accept, so its retry goes through
+        with self._lock:
+            if self._slots.pop(update_id, None) is not None and self.conn:
+                self.conn.execute('DELETE FROM seen_updates WHERE update_id = ?', (update_id,))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "tracked": len(self._slots),
+                "duplicates": self.duplicates,
+                "persistent": bool(self.conn),
+            }
@@ -1,20 +1,61 @@
 import os
+import json
 import logging
-import sqlite3
 from datetime import datetime
 from flask import Flask, request, jsonify
 import telegram
 from telegram.ext import Dispatcher, MessageHandler, Filters, CommandHandler, CallbackQueryHandler, ConversationHandler
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 from web3 import Web3
+from config import DATABASE_URL
+from database import UserDatabase
+from ingest import (
+    UpdatePoller, UpdateQueue, UpdateSpool, UpdateDeduplicator, update_chat_id, spooled_chat_id, ACCEPTED, REJECTED
+)
+from outbox import RateLimiter, PRIORITY_NORMAL
+from rpc import make_web3
+from status import StatusMonitor, webhook_info_dict, rpc_health
+from tokens import token_registry
 
 # ==================== CONFIGURATION ====================
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 PORT = int(os.getenv('PORT', 10000))
 
+# Webhook ingestion: 'queue' acks immediately and processes on worker threads
+# (ordered per chat, parallel across chats), 'spool' additionally writes each
+# update to a local durable log before acking and replays it after a crash,
+# 'inline' processes the update inside the webhook request
+INGEST_MODE = os.getenv('INGEST_MODE', 'spool')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 8))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))
+WEBHOOK_QUEUE_POLICY = os.getenv('WEBHOOK_QUEUE_POLICY', 'reject')
+WEBHOOK_SPOOL_PATH = os.getenv('WEBHOOK_SPOOL_PATH', 'webhook_spool.db')
+WEBHOOK_SPOOL_SYNC = os.getenv('WEBHOOK_SPOOL_SYNC', 'NORMAL')
+# Where updates come from: 'webhook' (Telegram POSTs to /webhook) or 'polling'
+# (batched long-polling getUpdates). Polling removes the webhook on startup;
+# webhook mode registers WEBHOOK_URL on startup when it is set.
+UPDATE_SOURCE = os.getenv('UPDATE_SOURCE', 'webhook')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+# What /set_webhook registers when WEBHOOK_URL is not set
+DEFAULT_WEBHOOK_URL = 'https://slhtelegrambot-production.up.railway.app/webhook'
+POLL_LIMIT = int(os.getenv('POLL_LIMIT', 100))
+POLL_TIMEOUT = int(os.getenv('POLL_TIMEOUT', 50))
+
+# Recently seen update_ids, so Telegram retries are dropped before parsing.
+# Persisted next to the spool by default; set WEBHOOK_DEDUP_PATH='' for memory only
+WEBHOOK_DEDUP_SIZE = int(os.getenv('WEBHOOK_DEDUP_SIZE', 10000))
+WEBHOOK_DEDUP_PATH = os.getenv('WEBHOOK_DEDUP_PATH', WEBHOOK_SPOOL_PATH if INGEST_MODE == 'spool' else '')
+
+# Seconds between background refreshes of webhook info and RPC health for /status
+STATUS_REFRESH_INTERVAL = int(os.getenv('STATUS_REFRESH_INTERVAL', 30))
+
+# Outbound Bot API limits (messages per second)
+SEND_RATE_GLOBAL = float(os.getenv('SEND_RATE_GLOBAL', 30))
+SEND_RATE_CHAT = float(os.getenv('SEND_RATE_CHAT', 1))
+SEND_RATE_GROUP = float(os.getenv('SEND_RATE_GROUP', 20 / 60))
+
 # Blockchain Configuration
 SLH_TOKEN_ADDRESS = "0xACb0A09414CEA1C879c67bB7A877E4e19480f022"
-BSC_RPC_URL = "https://bsc-dataseed.binance.org/"
 SLH_VALUE_ILS = 444
 
 # Community Links
@@ -39,115 +80,23 @@ bot = telegram.Bot(token=BOT_TOKEN)
 dispatcher = Dispatcher(bot, None, workers=0)
 
 # ==================== DATABASE ====================
-class UserDatabase:
-    def __init__(self):
-        self.conn = sqlite3.connect('slh_platform.db', check_same_thread=False)
-        self.create_tables()
-    
-    def create_tables(self):
-        cursor = self.conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                wallet_address TEXT,
-                phone TEXT,
-                website TEXT,
-                materials TEXT,
-                total_gifts_sent REAL DEFAULT 0,
-                total_gifts_received REAL DEFAULT 0,
-                joined_group BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS gifts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                from_user_id INTEGER,
-                to_user_id INTEGER,
-                amount REAL,
-                message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (from_user_id) REFERENCES users (user_id),
-                FOREIGN KEY (to_user_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS contracts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                creator_id INTEGER,
-                title TEXT,
-                description TEXT,
-                status TEXT DEFAULT 'active',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (creator_id) REFERENCES users (user_id)
-            )
-        ''')
-        
-        self.conn.commit()
-    
-    def add_user(self, user_id, username, first_name, last_name):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT OR IGNORE INTO users (user_id, username, first_name, last_name)
-            VALUES (?, ?, ?, ?)
-        ''', (user_id, username, first_name, last_name))
-        self.conn.commit()
-    
-    def update_wallet(self, user_id, wallet_address):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE users SET wallet_address = ? WHERE user_id = ?
-        ''', (wallet_address, user_id))
-        self.conn.commit()
-    
-    def update_contact_info(self, user_id, phone, website, materials):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE users SET phone = ?, website = ?, materials = ? WHERE user_id = ?
-        ''', (phone, website, materials, user_id))
-        self.conn.commit()
-    
-    def mark_joined_group(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            UPDATE users SET joined_group = TRUE WHERE user_id = ?
-        ''', (user_id,))
-        self.conn.commit()
-    
-    def get_user(self, user_id):
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
-        return cursor.fetchone()
-    
-    def add_gift(self, from_user_id, to_user_id, amount, message):
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            INSERT INTO gifts (from_user_id, to_user_id, amount, message)
-            VALUES (?, ?, ?, ?)
-        ''', (from_user_id, to_user_id, amount, message))
-        
-        cursor.execute('''
-            UPDATE users SET total_gifts_sent = total_gifts_sent + ? WHERE user_id = ?
-        ''', (amount, from_user_id))
-        
-        cursor.execute('''
-            UPDATE users SET total_gifts_received = total_gifts_received + ? WHERE user_id = ?
-        ''', (amount, to_user_id))
-        
-        self.conn.commit()
-
 db = UserDatabase()
+if DATABASE_URL:
+    # SQLModel tables (users, store, history), created and migrated before first use
+    from engine import init_db
+    init_db()
+
+# ==================== OUTBOUND MESSAGES ====================
+rate_limiter = RateLimiter(global_rate=SEND_RATE_GLOBAL, chat_rate=SEND_RATE_CHAT, group_rate=SEND_RATE_GROUP)
+
+def reply(update, text, priority=PRIORITY_NORMAL, **kwargs):
+    message = update.effective_message
+    return rate_limiter.call(message.chat_id, message.reply_text, text, priority=priority, **kwargs)
 
 # ==================== WALLET MANAGER ====================
 class SLHWallet:
     def __init__(self):
-        self.w3 = Web3(Web3.HTTPProvider(BSC_RPC_URL))
+        self.w3 = make_web3()
         self.token_abi = [
             {
                 "constant": True,
@@ -174,13 +123,14 @@ class SLHWallet:
             balance = self.token_contract.functions.balanceOf(
                 Web3.to_checksum_address(wallet_address)
             ).call()
-            decimals = self.token_contract.functions.decimals().call()
+            decimals = token_registry.get(self.w3, SLH_TOKEN_ADDRESS)["decimals"]
             return balance / (10 ** decimals)
         except Exception as e:
             logger.error(f"Error getting balance: {e}")
             return 0
 
 wallet_manager = SLHWallet()
+token_registry.warm(wallet_manager.w3, [SLH_TOKEN_ADDRESS])
 
 # ==================== KEYBOARDS ====================
 def get_main_keyboard():
@@ -242,7 +192,7 @@ def start(update, context):
 **בחר אפשרות מהתפריט 👇**
     """
     
-    update.message.reply_text(welcome_text, reply_markup=get_main_keyboard(), parse_mode='Markdown')
+    reply(update, welcome_text, reply_markup=get_main_keyboard(), parse_mode='Markdown')
 
 def handle_message(update, context):
     text = update.message.text
@@ -267,14 +217,14 @@ def handle_message(update, context):
     elif text.startswith("0x") and len(text) == 42:
         save_wallet_address(update, context, text)
     else:
-        update.message.reply_text("🤔 בחר אחת האפשרויות מהתפריט", reply_markup=get_main_keyboard())
+        reply(update, "🤔 בחר אחת האפשרויות מהתפריט", reply_markup=get_main_keyboard())
 
 def my_wallet(update, context):
     user = update.effective_user
     user_data = db.get_user(user.id)
     
-    if user_data and user_data[4]:
-        wallet_address = user_data[4]
+    if user_data and user_data.wallet_address:
+        wallet_address = user_data.wallet_address
         current_balance = wallet_manager.get_balance(wallet_address)
         
         wallet_text = f"""
@@ -287,8 +237,8 @@ def my_wallet(update, context):
 **💎 שווי נוכחי:** {current_balance * SLH_VALUE_ILS:,.0f} ₪
 
 **📊 סטטיסטיקות:**
-🎁 מתנות שנשלחו: {user_data[8] or 0:,.0f} SLH
-🎁 מתנות שהתקבלו: {user_data[9] or 0:,.0f} SLH
+🎁 מתנות שנשלחו: {user_data.total_gifts_sent:,.0f} SLH
+🎁 מתנות שהתקבלו: {user_data.total_gifts_received:,.0f} SLH
 
 **🚀 פעולות:**
 • לחץ '🎁 שלח מתנה' לשליחת SLH
@@ -312,7 +262,7 @@ def my_wallet(update, context):
 **שלח את כתובת הארנק שלך עכשיו...**
         """
     
-    update.message.reply_text(wallet_text, parse_mode='Markdown')
+    reply(update, wallet_text, parse_mode='Markdown')
 
 def send_gift_menu(update, context):
     gift_text = f"""
@@ -328,7 +278,7 @@ def send_gift_menu(update, context):
 
 **💡 טיפ:** הצטרף לקהילה כדי למצוא יותר חברים לשליחת מתנות!
     """
-    update.message.reply_text(gift_text, parse_mode='Markdown', reply_markup=get_gift_keyboard())
+    reply(update, gift_text, parse_mode='Markdown', reply_markup=get_gift_keyboard())
 
 def create_contract(update, context):
     contract_text = f"""
@@ -347,7 +297,7 @@ def create_contract(update, context):
 
 *פיצ'ר בשלבי פיתוח - יגיע soon!*
     """
-    update.message.reply_text(contract_text, parse_mode='Markdown')
+    reply(update, contract_text, parse_mode='Markdown')
 
 def my_contracts(update, context):
     contracts_text = """
@@ -357,7 +307,7 @@ def my_contracts(update, context):
 
 **🚀 בחר פעולה:**
     """
-    update.message.reply_text(contracts_text, parse_mode='Markdown', reply_markup=get_contracts_keyboard())
+    reply(update, contracts_text, parse_mode='Markdown', reply_markup=get_contracts_keyboard())
 
 def community_join(update, context):
     community_text = f"""
@@ -381,7 +331,7 @@ def community_join(update, context):
 
 **📞 מתקשה?** שלח הודעה למנהלים בקבוצה.
     """
-    update.message.reply_text(community_text, parse_mode='Markdown')
+    reply(update, community_text, parse_mode='Markdown')
 
 def settings_menu(update, context):
     user = update.effective_user
@@ -391,9 +341,9 @@ def settings_menu(update, context):
 **⚙️ הגדרות אישיות**
 
 **👤 פרטים נוכחיים:**
-📞 טלפון: {user_data[5] or 'לא הוגדר'}
-🌐 אתר: {user_data[6] or 'לא הוגדר'}
-📁 חומרים: {user_data[7] or 'לא הוגדר'}
+📞 טלפון: {user_data.phone or 'לא הוגדר'}
+🌐 אתר: {user_data.website or 'לא הוגדר'}
+📁 חומרים: {user_data.materials or 'לא הוגדר'}
 
 **👥 קהילה:** {TELEGRAM_GROUP_URL}
 
@@ -405,35 +355,35 @@ def settings_menu(update, context):
 
 **בחר פעולה:**
     """
-    update.message.reply_text(settings_text, parse_mode='Markdown', reply_markup=get_settings_keyboard())
+    reply(update, settings_text, parse_mode='Markdown', reply_markup=get_settings_keyboard())
 
 def user_stats(update, context):
     user = update.effective_user
     user_data = db.get_user(user.id)
     
     if user_data:
-        group_status = "✅ חבר בקהילה" if user_data[10] else "❌ טרם הצטרף"
+        group_status = "✅ חבר בקהילה" if user_data.joined_group else "❌ טרם הצטרף"
         
         stats_text = f"""
 **📊 הסטטיסטיקה המלאה שלך**
 
 **👤 פרטים:**
-שם: {user_data[2]} {user_data[3] or ''}
-משתמש: @{user_data[1] or 'לא רשום'}
+שם: {user_data.first_name} {user_data.last_name or ''}
+משתמש: @{user_data.username or 'לא רשום'}
 סטטוס קהילה: {group_status}
 
 **💼 פעילות:**
-🎁 מתנות שנשלחו: {user_data[8] or 0:,.0f} SLH
-🎁 מתנות שהתקבלו: {user_data[9] or 0:,.0f} SLH
+🎁 מתנות שנשלחו: {user_data.total_gifts_sent:,.0f} SLH
+🎁 מתנות שהתקבלו: {user_data.total_gifts_received:,.0f} SLH
 📊 מספר חוזים: *בקרוב*
 
 **👥 {group_status}**
-{TELEGRAM_GROUP_URL if not user_data[10] else 'תודה שהצטרפת!'}
+{TELEGRAM_GROUP_URL if not user_data.joined_group else 'תודה שהצטרפת!'}
         """
     else:
         stats_text = "לא נמצאו נתונים עבורך במערכת."
     
-    update.message.reply_text(stats_text, parse_mode='Markdown')
+    reply(update, stats_text, parse_mode='Markdown')
 
 def slh_info(update, context):
     slh_text = f"""
@@ -460,13 +410,13 @@ def slh_info(update, context):
 
 **👥 הצטרף לקהילה:** {TELEGRAM_GROUP_URL}
     """
-    update.message.reply_text(slh_text, parse_mode='Markdown')
+    reply(update, slh_text, parse_mode='Markdown')
 
 def save_wallet_address(update, context, wallet_address):
     user = update.effective_user
     
     if not wallet_address.startswith('0x') or len(wallet_address) != 42:
-        update.message.reply_text("❌ כתובת ארנק לא תקינה. אנא שלח כתובת בפורמט הנכון.")
+        reply(update, "❌ כתובת ארנק לא תקינה. אנא שלח כתובת בפורמט הנכון.")
         return
     
     try:
@@ -489,11 +439,11 @@ def save_wallet_address(update, context, wallet_address):
 **👥 הצטרף לקהילה שלנו:**
 {TELEGRAM_GROUP_URL}
         """
-        update.message.reply_text(success_text, parse_mode='Markdown')
+        reply(update, success_text, parse_mode='Markdown')
         
     except Exception as e:
         logger.error(f"Error saving wallet: {e}")
-        update.message.reply_text("❌ אירעה שגיאה בשמירת כתובת הארנק. נסה שוב.")
+        reply(update, "❌ אירעה שגיאה בשמירת כתובת הארנק. נסה שוב.")
 
 def handle_contact_update(update, context):
     text = update.message.text
@@ -531,11 +481,11 @@ def handle_contact_update(update, context):
 {TELEGRAM_GROUP_URL}
         """
         
-        update.message.reply_text(success_text, parse_mode='Markdown')
+        reply(update, success_text, parse_mode='Markdown')
         return ConversationHandler.END
         
     except Exception as e:
-        update.message.reply_text("❌ שגיאה בשמירת הפרטים. נסה שוב בפורמט הנכון.")
+        reply(update, "❌ שגיאה בשמירת הפרטים. נסה שוב בפורמט הנכון.")
         return SETTING_CONTACT
 
 def handle_callback(update, context):
@@ -544,16 +494,16 @@ def handle_callback(update, context):
     user = query.from_user
     
     if data == "back_main":
-        query.message.reply_text("🔙 חזרת לתפריט הראשי", reply_markup=get_main_keyboard())
+        reply(update, "🔙 חזרת לתפריט הראשי", reply_markup=get_main_keyboard())
     
     elif data == "my_contracts":
-        query.message.reply_text("📋 **החוזים הפעילים שלך:**\n\n*בקרוב - פיצ'ר בפיתוח*", parse_mode='Markdown')
+        reply(update, "📋 **החוזים הפעילים שלך:**\n\n*בקרוב - פיצ'ר בפיתוח*", parse_mode='Markdown')
     
     elif data == "quick_gift":
-        query.message.reply_text("🎁 **מתנה מהירה:**\n\n*בקרוב - פיצ'ר בפיתוח*", parse_mode='Markdown')
+        reply(update, "🎁 **מתנה מהירה:**\n\n*בקרוב - פיצ'ר בפיתוח*", parse_mode='Markdown')
     
     elif data == "update_contact":
-        query.message.reply_text(
+        reply(update,
             "**📞 עדכון פרטי קשר**\n\n"
             "שלח את הפרטים שלך בפורמט:\n"
             "`טלפון: 050-1234567\n"
@@ -564,7 +514,7 @@ def handle_callback(update, context):
     
     elif data == "confirm_join":
         db.mark_joined_group(user.id)
-        query.message.reply_text(
+        reply(update,
             f"✅ **הצטרפות אושרה!**\n\nברוך הבא לקהילת SLH {user.first_name}!\n\n"
             f"**👥 קבוצה:** {TELEGRAM_GROUP_URL}\n"
             f"**🚀 כעת תוכל:**\n• להתחבר עם סוחרים\n• לשתף בהזדמנויות\n• לקבל תמיכה מהקהילה",
@@ -576,14 +526,14 @@ def handle_callback(update, context):
 # ==================== CONVERSATION HANDLER ====================
 conv_handler = ConversationHandler(
     entry_points=[
-        CallbackQueryHandler(lambda u,c: u.callback_query.message.reply_text(
+        CallbackQueryHandler(lambda u,c: reply(u,
             "**📞 עדכון פרטי קשר**\n\nשלח את הפרטים בפורמט:\nטלפון: 050-1234567\nאתר: https://example.com\nחומרים: תיאור"
         ), pattern='^update_contact$')
     ],
     states={
         SETTING_CONTACT: [MessageHandler(Filters.text & ~Filters.command, handle_contact_update)],
     },
-    fallbacks=[CommandHandler('cancel', lambda u,c: u.message.reply_text("בוטל", reply_markup=get_main_keyboard()))]
+    fallbacks=[CommandHandler('cancel', lambda u,c: reply(u, "בוטל", reply_markup=get_main_keyboard()))]
 )
 
 # ==================== REGISTER HANDLERS ====================
@@ -592,12 +542,104 @@ dispatcher.add_handler(conv_handler)
 dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_message))
 dispatcher.add_handler(CallbackQueryHandler(handle_callback))
 
+# ==================== UPDATE INGESTION ====================
+def process_update_payload(payload):
+    update = Update.de_json(payload, bot)
+    dispatcher.process_update(update)
+
+def process_spooled_update(entry):
+    spool_id, payload = entry
+    try:
+        process_update_payload(payload)
+    finally:
+        # Failures are logged by the queue; only a crash leaves the entry for replay
+        spool.ack(spool_id)
+
+spool = UpdateSpool(WEBHOOK_SPOOL_PATH, WEBHOOK_SPOOL_SYNC) if INGEST_MODE == 'spool' else None
+dedup = UpdateDeduplicator(WEBHOOK_DEDUP_SIZE, WEBHOOK_DEDUP_PATH or None)
+
+update_queue = UpdateQueue(
+    process_spooled_update if spool else process_update_payload,
+    workers=WEBHOOK_WORKERS,
+    maxsize=WEBHOOK_QUEUE_SIZE,
+    policy=WEBHOOK_QUEUE_POLICY,
+    key_func=spooled_chat_id if spool else update_chat_id
+)
+if INGEST_MODE in ('queue', 'spool'):
+    update_queue.start()
+if spool:
+    spool.replay(update_queue)
+
+def enqueue_update(payload, raw=None, force=False):
+    # Returns False when the queue is full and the update was not taken
+    if spool:
+        # The update is marked seen on disk only once it is spooled, in the same
+        # transaction when the dedup window lives in the spool file
+        update_id = payload.get('update_id')
+        shared = dedup.path == spool.path
+        spool_id = spool.append(raw if raw is not None else json.dumps(payload), update_id if shared else None)
+        if not shared:
+            dedup.record(update_id)
+        outcome = update_queue.offer((spool_id, payload), force=force)
+        if outcome != ACCEPTED:
+            # Rejected: Telegram delivers it again. Shed: dropped for good, not
+            # replayed on some later restart when it (a confirmation, say) is stale
+            spool.ack(spool_id)
+        return outcome != REJECTED
+    return update_queue.submit(payload, force=force)
+
+# ==================== POLLING ====================
+def fetch_updates(offset, limit, timeout):
+    return [u.to_dict() for u in bot.get_updates(offset=offset, limit=limit, timeout=timeout)]
+
+def accept_polled_update(payload):
+    update_id = payload.get('update_id')
+    if dedup.seen(update_id, persist=not spool):
+        return
+    try:
+        if INGEST_MODE in ('queue', 'spool'):
+            enqueue_update(payload, force=True)
+        else:
+            process_update_payload(payload)
+    except Exception:
+        dedup.forget(update_id)
+        raise
+
+poller = UpdatePoller(
+    fetch_updates,
+    accept_polled_update,
+    wait=update_queue.wait_idle if INGEST_MODE in ('queue', 'spool') else None,
+    limit=POLL_LIMIT,
+    timeout=POLL_TIMEOUT
+)
+if UPDATE_SOURCE == 'polling':
+    # getUpdates is refused while a webhook is set
+    bot.delete_webhook()
+    poller.start()
+elif WEBHOOK_URL:
+    bot.set_webhook(WEBHOOK_URL)
+
+# ==================== STATUS ====================
+status_monitor = StatusMonitor(STATUS_REFRESH_INTERVAL)
+status_monitor.set_identity_source(bot.get_me)
+status_monitor.add_check('webhook', lambda: webhook_info_dict(bot.get_webhook_info()))
+status_monitor.add_check('rpc', lambda: rpc_health(wallet_manager.w3))
+status_monitor.add_gauge('queue', update_queue.stats)
+if spool:
+    status_monitor.add_gauge('spool', spool.stats)
+status_monitor.add_gauge('dedup', dedup.stats)
+status_monitor.add_gauge('database', db.stats)
+status_monitor.add_gauge('outbound', rate_limiter.stats)
+if UPDATE_SOURCE == 'polling':
+    status_monitor.add_gauge('poller', poller.stats)
+status_monitor.start()
+
 # ==================== FLASK ROUTES ====================
 @app.route('/')
 def home():
     return jsonify({
         "status": "SLH Platform - FULLY ACTIVE 🟢",
-        "bot": f"@{bot.get_me().username}",
+        "bot": status_monitor.bot_username(),
         "features": "Wallet, Gifts, Contracts, Community",
         "community": TELEGRAM_GROUP_URL
     })
@@ -605,27 +647,41 @@ def home():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     if request.method == "POST":
+        update_id = None
         try:
-            update = Update.de_json(request.get_json(force=True), bot)
-            dispatcher.process_update(update)
+            payload = request.get_json(force=True)
+            update_id = payload.get('update_id')
+            if dedup.seen(update_id, persist=not spool):
+                return "OK"
+            if INGEST_MODE in ('queue', 'spool'):
+                if not enqueue_update(payload, request.get_data(as_text=True)):
+                    dedup.forget(update_id)
+                    return "Busy", 503
+            else:
+                process_update_payload(payload)
             return "OK"
         except Exception as e:
             logger.error(f"Webhook error: {e}")
+            if update_id is not None:
+                dedup.forget(update_id)
             return "Error", 500
     return "OK"
 
 @app.route('/set_webhook', methods=['GET'])
 def set_webhook():
+    if UPDATE_SOURCE == 'polling':
+        return jsonify({"status": "error 🔴", "message": "Polling mode is active, restart with UPDATE_SOURCE=webhook"}), 409
     try:
-        webhook_url = f"https://slhtelegrambot-production.up.railway.app/webhook"
+        webhook_url = WEBHOOK_URL or DEFAULT_WEBHOOK_URL
         bot.delete_webhook()
         success = bot.set_webhook(webhook_url)
+        status_monitor.run_check('webhook')
         
         if success:
             return jsonify({
                 "status": "success 🟢",
                 "message": "Webhook configured!",
-                "bot": f"@{bot.get_me().username}",
+                "bot": status_monitor.bot_username(),
                 "url": webhook_url
             })
         else:
@@ -636,17 +692,18 @@ def set_webhook():
 
 @app.route('/status')
 def status():
-    try:
-        webhook_info = bot.get_webhook_info()
-        return jsonify({
-            "status": "FULLY ACTIVE 🟢",
-            "bot": f"@{bot.get_me().username}",
-            "webhook_url": webhook_info.url,
-            "webhook_set": bool(webhook_info.url),
-            "features": "Wallet, Gifts, Contracts, Community, Settings"
-        })
-    except Exception as e:
-        return jsonify({"status": "ERROR", "error": str(e)}), 500
+    # Served from the cached snapshot only, safe for frequent health checks
+    webhook_info = status_monitor.value('webhook', {})
+    return jsonify({
+        "status": "FULLY ACTIVE 🟢",
+        "bot": status_monitor.bot_username(),
+        "webhook_url": webhook_info.get('url'),
+        "webhook_set": bool(webhook_info.get('url')),
+        "update_source": UPDATE_SOURCE,
+        "ingest_mode": INGEST_MODE,
+        **status_monitor.snapshot(),
+        "features": "Wallet, Gifts, Contracts, Community, Settings"
+    })
 
 if __name__ == '__main__':
     logger.info("🚀 Starting FULL SLH Bot...")
@@ -0,0 +1,84 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Applied versions per component (one schema owner: a database file or a model module)
+SCHEMA_MIGRATIONS_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        component TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        description TEXT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (component, version)
+    )
+'''
+
+# A migration is (version, description, steps); a step is an SQL string or a
+# callable taking the open connection. Versions only ever get appended.
+
+
+def _pending(component, migrations, applied):
+    versions = [version for version, _, _ in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError(f"Migrations of {component} must have unique, increasing versions")
+    return [migration for migration in migrations if migration[0] not in applied]
+
+
+def _literal(value):
+    # Component names and descriptions are constants from this codebase
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def migrate_sqlite(engine, component, migrations):
+    # Runs as one job of a storage.SQLiteEngine: a single transaction, so a
+    # failing step leaves the schema at the last fully applied version
+    def apply(conn):
+        conn.execute(SCHEMA_MIGRATIONS_TABLE)
+        applied = {row[0] for row in conn.execute(
+            'SELECT version FROM schema_migrations WHERE component = ?', (component,)
+        ).fetchall()}
+        done = []
+        for version, description, steps in _pending(component, migrations, applied):
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                'INSERT INTO schema_migrations (component, version, description) VALUES (?, ?, ?)',
+                (component, version, description)
+            )
+            done.append(version)
+        return done
+
+    done = engine.run(apply)
+    if done:
+        logger.info(f"Migrated {component} to version {done[-1]} (applied {done})")
+    return done
+
+
+def migrate_sqlalchemy(engine, component, migrations):
+    # Same for a SQLAlchemy/SQLModel engine. On Postgres an advisory lock keeps
+    # two processes starting at once from applying the same version twice.
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.exec_driver_sql(f'SELECT pg_advisory_xact_lock(hashtext({_literal(component)}))')
+        conn.exec_driver_sql(SCHEMA_MIGRATIONS_TABLE)
+        applied = {row[0] for row in conn.exec_driver_sql(
+            f'SELECT version FROM schema_migrations WHERE component = {_literal(component)}'
+        ).fetchall()}
+        done = []
+        for version, description, steps in _pending(component, migrations, applied):
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.exec_driver_sql(step)
+            conn.exec_driver_sql(
+                'INSERT INTO schema_migrations (component, version, description) '
+                f'VALUES ({_literal(component)}, {int(version)}, {_literal(description)})'
+            )
+            done.append(version)
+    if done:
+        logger.info(f"Migrated {component} to version {done[-1]} (applied {done})")
+    return done
@@ -0,0 +1,108 @@
+import logging
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from config import MULTICALL_ADDRESS, MULTICALL_CHUNK_SIZE
+
+logger = logging.getLogger(__name__)
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"}
+                ],
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"}
+                ],
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+
+# balanceOf(address)
+BALANCE_OF_SELECTOR = bytes.fromhex('70a08231')
+
+# eth_call errors a smaller chunk can get past: a revert, gas or payload size. Anything
+# else (timeouts, connection errors, rate limits) would fail the halves just the same
+SPLIT_ERRORS = ('revert', 'out of gas', 'gas required exceeds', 'gas limit', 'too large', 'size', 'payload', '413')
+
+
+def is_split_error(error):
+    if isinstance(error, ContractLogicError):
+        return True
+    message = str(error).lower()
+    return any(text in message for text in SPLIT_ERRORS)
+
+
+def balance_of_calldata(address):
+    # Accepts anything Web3.is_address does, with or without 0x
+    return BALANCE_OF_SELECTOR + bytes.fromhex(Web3.to_checksum_address(address)[2:]).rjust(32, b'\0')
+
+
+class Multicall:
+    # Packs many read calls into Multicall3 aggregate3 eth_calls. Every call is
+    # allowed to fail on its own; a chunk the node refuses as a whole (revert,
+    # gas or payload limits) is split in half and retried, down to single
+    # calls. Transport errors are raised, not split into more requests.
+    def __init__(self, w3, address=MULTICALL_ADDRESS, chunk_size=MULTICALL_CHUNK_SIZE):
+        self.w3 = w3
+        self.chunk_size = chunk_size
+        self.contract = w3.eth.contract(address=Web3.to_checksum_address(address), abi=MULTICALL3_ABI)
+        self.calls = 0
+        self.splits = 0
+
+    def _aggregate(self, calls):
+        # Results in order, (success, returnData) or (False, b'') for calls we gave up on
+        try:
+            self.calls += 1
+            return self.contract.functions.aggregate3(calls).call()
+        except Exception as e:
+            if not is_split_error(e):
+                raise
+            if len(calls) == 1:
+                logger.warning(f"Multicall failed for {calls[0][0]}: {e}")
+                return [(False, b'')]
+            self.splits += 1
+            middle = len(calls) // 2
+            return self._aggregate(calls[:middle]) + self._aggregate(calls[middle:])
+
+    def aggregate(self, calls):
+        # calls: [(target, callData)], results in the same order
+        results = []
+        for i in range(0, len(calls), self.chunk_size):
+            chunk = [(target, True, data) for target, data in calls[i:i + self.chunk_size]]
+            results.extend(self._aggregate(chunk))
+        return results
+
+    def balances_of(self, token, addresses):
+        # Raw balanceOf per address; None for invalid addresses and failed calls
+        token = Web3.to_checksum_address(token)
+        balances = {}
+        valid = []
+        for address in addresses:
+            if Web3.is_address(address):
+                valid.append(address)
+            else:
+                balances[address] = None
+        results = self.aggregate([(token, balance_of_calldata(address)) for address in valid])
+        for address, (success, data) in zip(valid, results):
+            balances[address] = int.from_bytes(data[:32], 'big') if success and len(data) >= 32 else None
+        return balances
+
+    def stats(self):
+        return {"chunk_size": self.chunk_size, "calls": self.calls, "splits": self.splits}
@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from web3 import Web3
+from rpc import never_sent
+
+logger = logging.getLogger(__name__)
+
+# Node error messages meaning our local nonce is out of step with the chain
+NONCE_ERRORS = ('nonce too low', 'nonce too high', 'invalid nonce')
+# ... and meaning the node already holds this exact signed transaction, i.e. it was sent
+KNOWN_ERRORS = ('already known', 'known transaction')
+
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(text in message for text in NONCE_ERRORS)
+
+
+def is_known_transaction(error):
+    message = str(error).lower()
+    return any(text in message for text in KNOWN_ERRORS)
+
+
+class _Sender:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_nonce = None
+        self.in_flight = {}
+
+
+class NonceManager:
+    # Nonces per sending address, read from the chain once ('pending' count)
+    # and then handed out locally, so back-to-back transfers from one wallet
+    # neither wait for a round-trip nor collide. A node rejecting a nonce
+    # triggers a resync and one retry; a nonce that was allocated but never
+    # sent is given back, or forces a resync if later ones are already out.
+    # A node answering that it already knows the transaction (a retried
+    # broadcast) is a successful send, never a reason to sign it again. A
+    # nonce is only given back when the transaction provably never left:
+    # signing failed, the node answered with an error, or no connection was
+    # made. After a timeout or reset it may be in a mempool, so the nonce is
+    # kept and the hash returned for the receipt tracker to settle.
+    def __init__(self, w3, retries=1):
+        self.w3 = w3
+        self.retries = retries
+        self._senders = {}
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.resyncs = 0
+        # Broadcasts that failed ambiguously and were kept as pending
+        self.unconfirmed = 0
+
+    def _sender(self, address):
+        with self._lock:
+            sender = self._senders.get(address)
+            if sender is None:
+                sender = self._senders[address] = _Sender()
+            return sender
+
+    def _sync(self, address, sender):
+        # Caller holds sender.lock
+        sender.next_nonce = self.w3.eth.get_transaction_count(address, 'pending')
+        confirmed = self.w3.eth.get_transaction_count(address, 'latest')
+        for nonce in [n for n in sender.in_flight if n < confirmed]:
+            del sender.in_flight[nonce]
+        self.resyncs += 1
+
+    def allocate(self, address):
+        address = Web3.to_checksum_address(address)
+        sender = self._sender(address)
+        with sender.lock:
+            if sender.next_nonce is None:
+                self._sync(address, sender)
+            nonce = sender.next_nonce
+            sender.next_nonce += 1
+            self.allocated += 1
+            return nonce
+
+    def release(self, address, nonce):
+        # The transaction with this nonce never reached the node
+        address = Web3.to_checksum_address(address)
+        sender = self._sender(address)
+        with sender.lock:
+            if sender.next_nonce == nonce + 1:
+                sender.next_nonce = nonce
+            else:
+                # Later nonces are out already; the pending count shows the gap
+                sender.next_nonce = None
+
+    def resync(self, address):
+        address = Web3.to_checksum_address(address)
+        sender = self._sender(address)
+        with sender.lock:
+            self._sync(address, sender)
+        logger.warning(f"Nonce resynced for {address}: next {sender.next_nonce}")
+
+    def track(self, address, nonce, tx_hash):
+        sender = self._sender(Web3.to_checksum_address(address))
+        with sender.lock:
+            sender.in_flight[nonce] = (tx_hash, time.time())
+
+    def complete(self, address, nonce=None, tx_hash=None):
+        # The transaction was mined (or dropped for good), by nonce or by hash
+        sender = self._sender(Web3.to_checksum_address(address))
+        with sender.lock:
+            if nonce is None and tx_hash is not None:
+                tx_hash = Web3.to_hex(tx_hash)
+                nonce = next((n for n, (h, _) in sender.in_flight.items() if Web3.to_hex(h) == tx_hash), None)
+            sender.in_flight.pop(nonce, None)
+
+    def send(self, address, sign):
+        # sign(nonce) returns the signed transaction, broadcast here; returns its hash
+        for attempt in range(self.retries + 1):
+            nonce = self.allocate(address)
+            signed = None
+            try:
+                signed = sign(nonce)
+                tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
+            except Exception as e:
+                if signed is not None and is_known_transaction(e):
+                    tx_hash = signed.hash
+                elif is_nonce_error(e):
+                    self.resync(address)
+                    if attempt < self.retries:
+                        continue
+                    raise
+                elif signed is None or isinstance(e, ValueError) or never_sent(e):
+                    # web3 raises ValueError for a JSON-RPC error answer: the node refused it
+                    self.release(address, nonce)
+                    raise
+                else:
+                    logger.warning(f"Broadcast of {Web3.to_hex(signed.hash)} (nonce {nonce}) may have "
+                                   f"reached the node, keeping it as pending: {e}")
+                    self.unconfirmed += 1
+                    tx_hash = signed.hash
+            self.track(address, nonce, tx_hash)
+            return tx_hash
+
+    def stats(self):
+        with self._lock:
+            senders = list(self._senders.items())
+        return {
+            "senders": len(senders),
+            "allocated": self.allocated,
+            "resyncs": self.resyncs,
+            "unconfirmed": self.unconfirmed,
+            "in_flight": sum(len(sender.in_flight) for _, sender in senders),
+        }
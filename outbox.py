@@ -0,0 +1,293 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower goes first when sends compete for the global budget
+PRIORITY_TRANSACTIONAL = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2
+LANES = {PRIORITY_TRANSACTIONAL: 'transactional', PRIORITY_NORMAL: 'normal', PRIORITY_BULK: 'bulk'}
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        # Seconds until one token is available (0 if available now)
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now, seconds):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
+
+
+class RateLimiter:
+    # Token buckets for Bot API sends: one global bucket plus one per chat
+    # (private chats and groups have different limits). Callers wait in
+    # priority order for the global budget; a 429 blocks the chat for the
+    # retry_after Telegram asks for and the send is retried.
+    #
+    # Nobody polls: a caller whose chat bucket is empty sleeps until that
+    # bucket refills. Callers whose chat is ready queue in a heap by
+    # (priority, arrival); only the head sleeps until the global bucket
+    # refills, the rest sleep until the caller ahead of them wakes them.
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, group_rate=20 / 60, group_burst=20,
+                 max_retries=3, max_chats=10000):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._chats = {}
+        self._waiting = {}
+        self._ready = []
+        self._queued = set()
+        self._wakers = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+        self.max_waiting = 0
+        self.total_wait = 0.0
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chats:
+                for key in [k for k, b in self._chats.items() if b.idle(now)]:
+                    del self._chats[key]
+            if chat_id is not None and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _head(self):
+        # First ready ticket still queued; tickets that left are dropped lazily
+        while self._ready and self._ready[0] not in self._queued:
+            heapq.heappop(self._ready)
+        return self._ready[0] if self._ready else None
+
+    def _wake_head(self):
+        head = self._head()
+        if head is not None:
+            self._wakers[head]()
+
+    def _try_acquire(self, ticket):
+        # Returns 0 when the send may go now, otherwise how long to wait
+        # (None: until woken by the ticket ahead)
+        priority, seq, chat_id = ticket
+        now = time.monotonic()
+        with self._lock:
+            chat_delay = self._chat_bucket(chat_id, now).delay(now)
+            if chat_delay > 0:
+                if ticket in self._queued:
+                    # Our chat is empty after all: let the next one have the global budget
+                    self._queued.discard(ticket)
+                    self._wake_head()
+                return chat_delay
+            if ticket not in self._queued:
+                self._queued.add(ticket)
+                heapq.heappush(self._ready, ticket)
+            if self._head() != ticket:
+                return None
+            global_delay = self.global_bucket.delay(now)
+            if global_delay > 0:
+                return global_delay
+            self.global_bucket.take(now)
+            self._chat_bucket(chat_id, now).take(now)
+            heapq.heappop(self._ready)
+            self._queued.discard(ticket)
+            self._wake_head()
+            return 0.0
+
+    def _enter(self, chat_id, priority, wake):
+        ticket = (priority, next(self._seq), chat_id)
+        with self._lock:
+            self._waiting[ticket] = time.monotonic()
+            self._wakers[ticket] = wake
+            if len(self._waiting) > self.max_waiting:
+                self.max_waiting = len(self._waiting)
+        return ticket
+
+    def _leave(self, ticket):
+        with self._lock:
+            self.total_wait += time.monotonic() - self._waiting.pop(ticket)
+            del self._wakers[ticket]
+            if ticket in self._queued:
+                # Gave up while queued (an error or a cancelled task): don't strand the rest
+                self._queued.discard(ticket)
+                self._wake_head()
+
+    def acquire(self, chat_id, priority=PRIORITY_NORMAL):
+        woken = threading.Event()
+        ticket = self._enter(chat_id, priority, woken.set)
+        try:
+            while True:
+                woken.clear()
+                delay = self._try_acquire(ticket)
+                if delay == 0:
+                    return
+                woken.wait(delay)
+        finally:
+            self._leave(ticket)
+
+    async def acquire_async(self, chat_id, priority=PRIORITY_NORMAL):
+        woken = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        ticket = self._enter(chat_id, priority, lambda: loop.call_soon_threadsafe(woken.set))
+        try:
+            while True:
+                woken.clear()
+                delay = self._try_acquire(ticket)
+                if delay == 0:
+                    return
+                try:
+                    await asyncio.wait_for(woken.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._leave(ticket)
+
+    def _retry_after(self, chat_id, e, attempt):
+        retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+        now = time.monotonic()
+        with self._lock:
+            self._chat_bucket(chat_id, now).block(now, retry_after)
+            if attempt >= self.max_retries:
+                self.failed += 1
+                return False
+            self.retries += 1
+        logger.warning(f"Flood limit for chat {chat_id}, retrying in {retry_after}s")
+        return True
+
+    def call(self, chat_id, func, *args, priority=PRIORITY_NORMAL, **kwargs):
+        for attempt in itertools.count(1):
+            self.acquire(chat_id, priority)
+            try:
+                result = func(*args, **kwargs)
+            except RetryAfter as e:
+                if not self._retry_after(chat_id, e, attempt):
+                    raise
+                continue
+            with self._lock:
+                self.sent += 1
+            return result
+
+    async def call_async(self, chat_id, func, *args, priority=PRIORITY_NORMAL, **kwargs):
+        for attempt in itertools.count(1):
+            await self.acquire_async(chat_id, priority)
+            try:
+                result = await func(*args, **kwargs)
+            except RetryAfter as e:
+                if not self._retry_after(chat_id, e, attempt):
+                    raise
+                continue
+            with self._lock:
+                self.sent += 1
+            return result
+
+    def stats(self):
+        with self._lock:
+            waiting = {lane: 0 for lane in LANES.values()}
+            for priority, _, _ in self._waiting:
+                lane = LANES.get(priority, str(priority))
+                waiting[lane] = waiting.get(lane, 0) + 1
+            return {
+                "waiting": waiting,
+                "max_waiting": self.max_waiting,
+                "tracked_chats": len(self._chats),
+                "sent": self.sent,
+                "retries": self.retries,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.total_wait / self.sent * 1000, 2) if self.sent else 0,
+            }
+
+
+class _Capture:
+    def __init__(self):
+        self.payload = None
+        self.send = None
+        self.overflow = False
+
+
+class WebhookReplies:
+    # Lets an update processed inside the webhook request answer with its
+    # single outbound call as the HTTP response body instead of a separate
+    # request to api.telegram.org. As soon as a second call is made the
+    # captured one is sent normally and everything falls back to regular sends.
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.replied = 0
+        self.fallbacks = 0
+
+    @contextmanager
+    def capture(self):
+        capture = _Capture()
+        self._local.current = capture
+        try:
+            yield capture
+        finally:
+            self._local.current = None
+
+    def offer(self, payload, send):
+        # Returns True if the call was captured and must not be sent now
+        capture = getattr(self._local, 'current', None)
+        if capture is None or capture.overflow:
+            return False
+        if capture.payload is None:
+            capture.payload = payload
+            capture.send = send
+            return True
+        capture.overflow = True
+        pending, capture.payload, capture.send = capture.send, None, None
+        with self._lock:
+            self.fallbacks += 1
+        pending()
+        return False
+
+    def response(self, capture):
+        # Webhook response body for the captured call, or None
+        if capture.payload is None:
+            return None
+        with self._lock:
+            self.replied += 1
+        return capture.payload
+
+    def stats(self):
+        with self._lock:
+            return {"replied": self.replied, "fallbacks": self.fallbacks}
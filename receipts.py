@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+from balances import TRANSFER_TOPIC
+from config import RECEIPT_POLL_INTERVAL, RECEIPT_BATCH_SIZE, RECEIPT_CONFIRMATIONS, RECEIPT_DROP_AFTER
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptTracker:
+    # One poller for every 'pending' row of the transactions table. On each
+    # new block the receipts of all pending hashes are requested together (the
+    # batching provider sends them as JSON-RPC batches) and each row is settled
+    # as confirmed or failed with its block number and gas used, once it is
+    # `confirmations` blocks deep. A hash the node still doesn't know after
+    # drop_after seconds is only marked dropped once the sender's mined
+    # nonce has passed its nonce: until then it can still be mined, so its
+    # nonce is handed back to the nonce manager instead (the next transfer
+    # takes it, which settles the question either way).
+    def __init__(self, w3, db, notify=None, cache=None, nonces=None, interval=RECEIPT_POLL_INTERVAL,
+                 batch_size=RECEIPT_BATCH_SIZE, confirmations=RECEIPT_CONFIRMATIONS, drop_after=RECEIPT_DROP_AFTER):
+        self.w3 = w3
+        self.db = db
+        # notify(user_id, tx_hash, amount, status, receipt)
+        self.notify = notify
+        self.cache = cache
+        self.nonces = nonces
+        self.interval = interval
+        self.batch_size = batch_size
+        self.confirmations = max(confirmations, 1)
+        self.drop_after = drop_after
+        self._executor = ThreadPoolExecutor(max_workers=batch_size, thread_name_prefix='receipts')
+        self._thread = None
+        # tx hashes whose nonce was already handed back
+        self._released = set()
+        self.last_block = None
+        self.pending = 0
+        self.settled = {'confirmed': 0, 'failed': 0, 'dropped': 0}
+        self.errors = 0
+
+    def _receipt(self, tx_hash):
+        try:
+            return self.w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+
+    def _dropped(self, tx_hash, from_address, nonce):
+        # Never mined and never can be: unknown to the node, and its nonce used by another transaction
+        if nonce is None or not from_address:
+            # Recorded without a nonce, no way to tell
+            return False
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+            return False
+        except TransactionNotFound:
+            pass
+        if self.w3.eth.get_transaction_count(Web3.to_checksum_address(from_address), 'latest') > nonce:
+            # Mined meanwhile after all?
+            return self._receipt(tx_hash) is None
+        if self.nonces and tx_hash not in self._released:
+            self._released.add(tx_hash)
+            logger.warning(f"Transaction {tx_hash} unknown after {self.drop_after}s, nonce {nonce} handed back")
+            self.nonces.resync(from_address)
+        return False
+
+    def poll(self):
+        head = self.w3.eth.block_number
+        if head == self.last_block:
+            return 0
+        pending = self.db.get_pending_transactions()
+        self.pending = len(pending)
+        settled = 0
+        for i in range(0, len(pending), self.batch_size):
+            chunk = pending[i:i + self.batch_size]
+            futures = [self._executor.submit(self._receipt, row[3]) for row in chunk]
+            for (_, user_id, amount, tx_hash, age, from_address, nonce), future in zip(chunk, futures):
+                try:
+                    receipt = future.result()
+                    if receipt is None:
+                        if age > self.drop_after and self._dropped(tx_hash, from_address, nonce):
+                            self._settle(user_id, tx_hash, amount, 'dropped', None, from_address, nonce)
+                            settled += 1
+                        continue
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Receipt lookup failed for {tx_hash}: {e}")
+                    continue
+                if head - receipt['blockNumber'] + 1 < self.confirmations:
+                    continue
+                self._settle(user_id, tx_hash, amount, 'confirmed' if receipt['status'] == 1 else 'failed', receipt)
+                settled += 1
+        self.last_block = head
+        self.pending -= settled
+        return settled
+
+    def _settle(self, user_id, tx_hash, amount, status, receipt, from_address=None, nonce=None):
+        block_number = receipt['blockNumber'] if receipt else None
+        gas_used = receipt['gasUsed'] if receipt else None
+        self.db.settle_transaction(tx_hash, status, block_number, gas_used)
+        self.settled[status] += 1
+        self._released.discard(tx_hash)
+        if status == 'dropped' and self.nonces:
+            self.nonces.complete(from_address, nonce=nonce)
+        if receipt:
+            if self.nonces:
+                self.nonces.complete(receipt['from'], tx_hash=tx_hash)
+            if self.cache:
+                for log in receipt['logs']:
+                    topics = log['topics']
+                    if len(topics) >= 3 and Web3.to_hex(topics[0]) == TRANSFER_TOPIC:
+                        self.cache.on_transfer(
+                            log['address'], '0x' + bytes(topics[1])[-20:].hex(), '0x' + bytes(topics[2])[-20:].hex()
+                        )
+        logger.info(f"Transaction {tx_hash} {status} (block {block_number}, gas {gas_used})")
+        if self.notify and user_id:
+            try:
+                self.notify(user_id, tx_hash, amount, status, receipt)
+            except Exception as e:
+                logger.error(f"Receipt notification error for {tx_hash}: {e}")
+
+    def _loop(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Receipt tracker error: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, name='receipt-tracker', daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        return {
+            "pending": self.pending,
+            "last_block": self.last_block,
+            "confirmations": self.confirmations,
+            **self.settled,
+            "errors": self.errors,
+        }
@@ -0,0 +1,126 @@
+import bisect
+import re
+import threading
+import time
+
+# Latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Route:
+    def __init__(self, name, handler):
+        self.name = name
+        self.handler = handler
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms, failed):
+        with self._lock:
+            self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+            self.count += 1
+            self.total_ms += elapsed_ms
+            if elapsed_ms > self.max_ms:
+                self.max_ms = elapsed_ms
+            if failed:
+                self.errors += 1
+
+    def _percentile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else round(self.max_ms, 1)
+        return 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "errors": self.errors,
+                "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+                "max_ms": round(self.max_ms, 2),
+                "p50_ms": self._percentile(0.5),
+                "p95_ms": self._percentile(0.95),
+                "p99_ms": self._percentile(0.99),
+                "histogram": dict(zip([f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"], self.buckets)),
+            }
+
+
+class Router:
+    # Routing table for message texts / callback data: exact keys are a dict
+    # lookup, patterns (addresses etc.) are tried in order only on a miss.
+    # Every route, including the fallback, records latency and errors under
+    # its handler's name.
+    def __init__(self, name, exact=None, patterns=None, fallback=None):
+        self.name = name
+        self._exact = {}
+        self._patterns = []
+        self.fallback = Route(fallback.__name__, fallback) if fallback else None
+        self.unmatched = 0
+        for key, handler in (exact or {}).items():
+            self.add_exact(key, handler)
+        for pattern, handler in (patterns or []):
+            self.add_pattern(pattern, handler)
+
+    def add_exact(self, key, handler, name=None):
+        self._exact[key] = Route(name or handler.__name__, handler)
+
+    def add_pattern(self, pattern, handler, name=None):
+        self._patterns.append((re.compile(pattern), Route(name or handler.__name__, handler)))
+
+    def resolve(self, key):
+        route = self._exact.get(key)
+        if route is not None:
+            return route
+        if key is not None:
+            for pattern, route in self._patterns:
+                if pattern.match(key):
+                    return route
+        return self.fallback
+
+    def dispatch(self, key, update, context):
+        route = self.resolve(key)
+        if route is None:
+            self.unmatched += 1
+            return None
+        started = time.perf_counter()
+        failed = False
+        try:
+            return route.handler(update, context)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            route.observe((time.perf_counter() - started) * 1000, failed)
+
+    async def dispatch_async(self, key, update, context):
+        route = self.resolve(key)
+        if route is None:
+            self.unmatched += 1
+            return None
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await route.handler(update, context)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            route.observe((time.perf_counter() - started) * 1000, failed)
+
+    def routes(self):
+        routes = list(self._exact.values()) + [route for _, route in self._patterns]
+        if self.fallback:
+            routes.append(self.fallback)
+        return routes
+
+    def stats(self):
+        stats = {route.name: route.stats() for route in self.routes() if route.count}
+        stats["unmatched"] = self.unmatched
+        return stats
@@ -0,0 +1,431 @@
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+from web3 import Web3, HTTPProvider
+from web3._utils.encoding import Web3JsonEncoder
+from config import (
+    BSC_RPC_URLS, RPC_BATCH_WINDOW_MS, RPC_BATCH_SIZE, RPC_TIMEOUT,
+    RPC_FAILURE_THRESHOLD, RPC_COOLDOWN, RPC_MAX_BLOCK_LAG, RPC_HEAD_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Calls a second endpoint must not get once the first may have received them
+NON_IDEMPOTENT = ('eth_sendRawTransaction', 'eth_sendTransaction')
+# JSON-RPC error messages about the endpoint (throttled, overloaded, behind), not the call
+ENDPOINT_ERRORS = ('rate limit', 'too many requests', 'request limit', 'quota', 'capacity',
+                   'header not found', 'missing trie node')
+
+
+class EndpointError(Exception):
+    # The endpoint answered, but with an error about itself; response is that answer
+    def __init__(self, response):
+        super().__init__(str(response))
+        self.response = response
+
+
+def _methods(payload):
+    return [call.get('method') for call in (payload if isinstance(payload, list) else [payload])]
+
+
+def is_endpoint_error(response):
+    responses = response if isinstance(response, list) else [response]
+    for item in responses:
+        error = item.get('error') if isinstance(item, dict) else None
+        if error:
+            message = str(error.get('message', error) if isinstance(error, dict) else error).lower()
+            if any(text in message for text in ENDPOINT_ERRORS):
+                return True
+    return False
+
+
+def never_sent(error):
+    # Failed while connecting, so the request was never written to the endpoint
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class Endpoint:
+    def __init__(self, url, alpha=0.3):
+        self.url = url
+        self.session = requests.Session()
+        self.alpha = alpha
+        self.latency_ms = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probing = False
+        self.block_number = None
+        self.lagging = False
+
+    def record(self, latency_ms, failed):
+        # Exponentially weighted, recent behaviour dominates
+        self.requests += 1
+        if failed:
+            self.errors += 1
+            self.consecutive_failures += 1
+        else:
+            self.consecutive_failures = 0
+            self.latency_ms = latency_ms if self.latency_ms is None else (
+                self.alpha * latency_ms + (1 - self.alpha) * self.latency_ms
+            )
+        self.error_rate = self.alpha * (1.0 if failed else 0.0) + (1 - self.alpha) * self.error_rate
+
+    def score(self):
+        # Unmeasured endpoints go first so every node gets a latency sample
+        if self.latency_ms is None:
+            return 0.0
+        return self.latency_ms * (1 + 4 * self.error_rate)
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "state": self.state,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "errors": self.errors,
+            "block_number": self.block_number,
+            "lagging": self.lagging,
+        }
+
+
+class RPCPool:
+    # Several RPC endpoints behind one post(). Requests go to the healthy node
+    # with the lowest EWMA latency and fail over to the next one on transport
+    # errors and on JSON-RPC errors about the node itself (rate limits and the
+    # like), which also count against its health. Transaction broadcasts only
+    # fail over when the connection was never made: after a timeout the first
+    # node may hold the transaction, so the error goes to the caller instead
+    # of the same transaction to another node.
+    # An endpoint failing `failure_threshold` times in a row is opened
+    # for `cooldown` seconds, then gets a single half-open probe request.
+    # Nodes more than `max_lag` blocks behind the best head are skipped.
+    def __init__(self, urls, timeout=10, failure_threshold=3, cooldown=30, max_lag=5, head_interval=15):
+        if not urls:
+            raise ValueError("RPCPool needs at least one endpoint")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_lag = max_lag
+        self.head_interval = head_interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self.failovers = 0
+
+    def _candidates(self):
+        # Endpoints to try, best first
+        now = time.monotonic()
+        with self._lock:
+            ready = []
+            probes = []
+            for endpoint in self.endpoints:
+                if endpoint.state == CLOSED:
+                    ready.append(endpoint)
+                elif not endpoint.probing and now - endpoint.opened_at >= self.cooldown:
+                    endpoint.state = HALF_OPEN
+                    endpoint.probing = True
+                    probes.append(endpoint)
+            fresh = [e for e in ready if not e.lagging]
+            # A due probe goes first; if it fails the request fails over as usual
+            ordered = probes + sorted(fresh, key=Endpoint.score) + sorted(
+                [e for e in ready if e.lagging], key=Endpoint.score
+            )
+            if not ordered:
+                # Everything is open: better a likely failure than no attempt
+                ordered = sorted(self.endpoints, key=lambda e: e.opened_at)
+        return ordered
+
+    def _record(self, endpoint, latency_ms, failed):
+        with self._lock:
+            endpoint.record(latency_ms, failed)
+            if endpoint.state == HALF_OPEN:
+                endpoint.probing = False
+                endpoint.state = OPEN if failed else CLOSED
+                if failed:
+                    endpoint.opened_at = time.monotonic()
+                else:
+                    logger.info(f"✅ RPC endpoint {endpoint.url} recovered")
+            elif endpoint.state == OPEN and not failed:
+                endpoint.state = CLOSED
+            elif failed and endpoint.state == CLOSED and endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.state = OPEN
+                endpoint.opened_at = time.monotonic()
+                logger.warning(f"RPC endpoint {endpoint.url} opened after {endpoint.consecutive_failures} failures")
+
+    def _post_to(self, endpoint, payload):
+        started = time.monotonic()
+        try:
+            response = endpoint.session.post(
+                endpoint.url,
+                data=json.dumps(payload, cls=Web3JsonEncoder),
+                headers={'Content-Type': 'application/json'},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            if is_endpoint_error(result):
+                raise EndpointError(result)
+        except Exception:
+            self._record(endpoint, (time.monotonic() - started) * 1000, True)
+            raise
+        self._record(endpoint, (time.monotonic() - started) * 1000, False)
+        return result
+
+    def post(self, payload):
+        if self._thread is None:
+            self.start()
+        retry_safe = not any(method in NON_IDEMPOTENT for method in _methods(payload))
+        error = None
+        for attempt, endpoint in enumerate(self._candidates()):
+            if attempt:
+                self.failovers += 1
+            try:
+                return self._post_to(endpoint, payload)
+            except EndpointError as e:
+                logger.warning(f"RPC endpoint {endpoint.url} refused the request: {e}")
+                if not retry_safe:
+                    return e.response
+                error = e
+            except Exception as e:
+                logger.warning(f"RPC request to {endpoint.url} failed: {e}")
+                if not retry_safe and not never_sent(e):
+                    raise
+                error = e
+        if isinstance(error, EndpointError):
+            # Every node refused: the caller sees the JSON-RPC error itself
+            return error.response
+        raise error
+
+    def check_heads(self):
+        heads = {}
+        for endpoint in self.endpoints:
+            if endpoint.state == OPEN:
+                continue
+            try:
+                response = self._post_to(endpoint, {"jsonrpc": "2.0", "method": "eth_blockNumber", "params": [], "id": 0})
+                heads[endpoint] = int(response['result'], 16)
+            except Exception as e:
+                logger.warning(f"Head check for {endpoint.url} failed: {e}")
+        if not heads:
+            return
+        best = max(heads.values())
+        with self._lock:
+            for endpoint, head in heads.items():
+                endpoint.block_number = head
+                lagging = best - head > self.max_lag
+                if lagging and not endpoint.lagging:
+                    logger.warning(f"RPC endpoint {endpoint.url} is {best - head} blocks behind")
+                endpoint.lagging = lagging
+
+    def _loop(self):
+        while True:
+            try:
+                self.check_heads()
+            except Exception as e:
+                logger.error(f"RPC head check error: {e}")
+            time.sleep(self.head_interval)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name='rpc-heads', daemon=True)
+        if len(self.endpoints) > 1 and self.head_interval:
+            self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "failovers": self.failovers,
+                "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+            }
+
+
+class PooledHTTPProvider(HTTPProvider):
+    # Sends each web3 request through an RPCPool
+    def __init__(self, pool):
+        super().__init__(pool.endpoints[0].url, request_kwargs={'timeout': pool.timeout})
+        self.pool = pool
+        self._ids = itertools.count(1)
+
+    def make_request(self, method, params):
+        return self.pool.post({"jsonrpc": "2.0", "method": method, "params": params, "id": next(self._ids)})
+
+    def stats(self):
+        return {"batching": False, **self.pool.stats()}
+
+
+class BatchingHTTPProvider(PooledHTTPProvider):
+    # JSON-RPC requests made from any thread within `window` seconds of each
+    # other are sent as one batch array (at most max_batch calls) and the
+    # responses handed back by id. A batch answered with a single error
+    # object fails every call with that error; only an endpoint saying it
+    # doesn't take batches switches the provider to one call per request.
+    # Transaction broadcasts are never batched, so they are posted once.
+    def __init__(self, pool, window=0.005, max_batch=50, senders=4):
+        super().__init__(pool)
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._senders = ThreadPoolExecutor(max_workers=senders, thread_name_prefix='rpc-batch')
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.batch_supported = True
+        self.requests = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.fallbacks = 0
+        self.errors = 0
+
+    def make_request(self, method, params):
+        if self._thread is None:
+            self._start()
+        future = Future()
+        self._queue.put((method, params, future))
+        return future.result()
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name='rpc-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch):
+        with self._lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        calls = {next(self._ids): item for item in batch}
+        singles = {call_id: item for call_id, item in calls.items()
+                   if not self.batch_supported or item[0] in NON_IDEMPOTENT}
+        for call_id in singles:
+            del calls[call_id]
+        if len(calls) == 1:
+            singles.update(calls)
+            calls = {}
+        for call_id, item in singles.items():
+            self._send_single(call_id, item)
+        if not calls:
+            return
+        try:
+            responses = self.pool.post([
+                {"jsonrpc": "2.0", "method": method, "params": params, "id": call_id}
+                for call_id, (method, params, _) in calls.items()
+            ])
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            for _, _, future in calls.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if not isinstance(responses, list):
+            error = responses.get('error') if isinstance(responses, dict) else None
+            if error is not None and 'batch' in str(error).lower():
+                # The endpoint doesn't take batches: these calls and all later ones go one by one
+                with self._lock:
+                    self.fallbacks += 1
+                    self.batch_supported = False
+                logger.warning(f"RPC batching disabled, endpoint refused a batch: {error}")
+                for call_id, item in calls.items():
+                    self._send_single(call_id, item)
+                return
+            # One answer for the whole batch (e.g. rate limited): it is every call's answer
+            with self._lock:
+                self.errors += 1
+            if error is None:
+                error = {"code": -32603, "message": f"unexpected batch response: {responses}"}
+            for call_id, (_, _, future) in calls.items():
+                future.set_result({"jsonrpc": "2.0", "id": call_id, "error": error})
+            return
+        for response in responses:
+            item = calls.pop(response.get('id'), None)
+            if item is not None:
+                item[2].set_result(response)
+        for call_id, item in calls.items():
+            # Dropped from the batch response, ask again on its own (reads only, see above)
+            self._send_single(call_id, item)
+
+    def _send_single(self, call_id, item):
+        method, params, future = item
+        try:
+            future.set_result(self.pool.post({"jsonrpc": "2.0", "method": method, "params": params, "id": call_id}))
+        except Exception as e:
+            future.set_exception(e)
+
+    def stats(self):
+        with self._lock:
+            batching = {
+                "batching": self.batch_supported,
+                "requests": self.requests,
+                "batches": self.batches,
+                "avg_batch": round(self.requests / self.batches, 2) if self.batches else 0,
+                "max_batch": self.max_batch_seen,
+                "fallbacks": self.fallbacks,
+                "errors": self.errors,
+            }
+        return {**batching, **self.pool.stats()}
+
+
+_pools = {}
+
+
+def make_pool(urls=BSC_RPC_URLS):
+    # One pool (sessions, health, head checks) per endpoint list per process
+    key = tuple(urls)
+    if key not in _pools:
+        _pools[key] = RPCPool(
+            urls,
+            timeout=RPC_TIMEOUT,
+            failure_threshold=RPC_FAILURE_THRESHOLD,
+            cooldown=RPC_COOLDOWN,
+            max_lag=RPC_MAX_BLOCK_LAG,
+            head_interval=RPC_HEAD_INTERVAL
+        )
+    return _pools[key]
+
+
+def make_provider(urls=BSC_RPC_URLS):
+    pool = make_pool(urls)
+    if RPC_BATCH_WINDOW_MS <= 0:
+        return PooledHTTPProvider(pool)
+    return BatchingHTTPProvider(pool, RPC_BATCH_WINDOW_MS / 1000, RPC_BATCH_SIZE)
+
+
+def make_web3(urls=BSC_RPC_URLS):
+    if isinstance(urls, str):
+        urls = [urls]
+    return Web3(make_provider(urls))
@@ -0,0 +1,151 @@
+import logging
+from web3 import Web3
+from balances import balance_cache
+from config import CHAIN_ID, SLH_TOKEN_ADDRESS
+from gas import GasEstimator, GasOracle
+from indexer import TransferIndexer
+from multicall import Multicall
+from nonces import NonceManager
+from rpc import make_web3
+from tokens import token_registry
+
+logger = logging.getLogger(__name__)
+
+class SLHWallet:
+    def __init__(self):
+        self.w3 = make_web3()
+        self.transfer_index = None
+        self.multicall = Multicall(self.w3)
+        self.nonces = NonceManager(self.w3)
+        self.gas_oracle = GasOracle(self.w3)
+        self.gas = GasEstimator(self.w3)
+        self.token_abi = [
+            {
+                "constant": True,
+                "inputs": [{"name": "_owner", "type": "address"}],
+                "name": "balanceOf",
+                "outputs": [{"name": "balance", "type": "uint256"}],
+                "type": "function"
+            },
+            {
+                "constant": True,
+                "inputs": [],
+                "name": "decimals",
+                "outputs": [{"name": "", "type": "uint8"}],
+                "type": "function"
+            },
+            {
+                "constant": False,
+                "inputs": [
+                    {"name": "_to", "type": "address"},
+                    {"name": "_value", "type": "uint256"}
+                ],
+                "name": "transfer",
+                "outputs": [{"name": "", "type": "bool"}],
+                "type": "function"
+            }
+        ]
+        try:
+            self.token_contract = self.w3.eth.contract(
+                address=Web3.to_checksum_address(SLH_TOKEN_ADDRESS),
+                abi=self.token_abi
+            )
+            logger.info("✅ SLH Wallet Manager initialized successfully")
+        except Exception as e:
+            logger.error(f"❌ Error initializing wallet: {e}")
+    
+    def decimals(self):
+        # No default here, a wrong guess would misprice transfers
+        return token_registry.get(self.w3, SLH_TOKEN_ADDRESS)["decimals"]
+
+    def warm_up(self):
+        token_registry.warm(self.w3, [SLH_TOKEN_ADDRESS])
+
+    def watch_transfers(self, interval):
+        # Indexes SLH transfers locally and drops cached balances touched by
+        # on-chain transfers we did not make
+        self.transfer_index = TransferIndexer(self.w3, SLH_TOKEN_ADDRESS, cache=balance_cache)
+        self.transfer_index.start(interval)
+
+    def _fetch_balance(self, wallet_address):
+        balance = self.token_contract.functions.balanceOf(
+            Web3.to_checksum_address(wallet_address)
+        ).call()
+        return balance / (10 ** self.decimals())
+
+    def get_balance(self, wallet_address, fresh=False):
+        try:
+            return balance_cache.get(
+                SLH_TOKEN_ADDRESS, wallet_address, lambda: self._fetch_balance(wallet_address), fresh=fresh
+            )
+        except Exception as e:
+            logger.error(f"Error getting balance: {e}")
+            return 0
+    
+    def get_balances(self, wallet_addresses):
+        # Bulk read for reports: {address: balance}, None where the read failed
+        raw = self.multicall.balances_of(SLH_TOKEN_ADDRESS, wallet_addresses)
+        scale = 10 ** self.decimals()
+        balances = {}
+        for address, value in raw.items():
+            balances[address] = value / scale if value is not None else None
+            if value is not None:
+                balance_cache.put(SLH_TOKEN_ADDRESS, address, balances[address])
+        return balances
+    
+    def transfer_tokens(self, from_private_key, to_address, amount):
+        try:
+            # Get sender address from private key
+            account = self.w3.eth.account.from_key(from_private_key)
+            sender_address = account.address
+            
+            amount_wei = int(amount * (10 ** self.decimals()))
+            
+            # Check balance
+            sender_balance = self.get_balance(sender_address, fresh=True)
+            if sender_balance < amount:
+                return {'success': False, 'error': f'Insufficient balance. You have {sender_balance:.2f} SLH, need {amount:.2f} SLH'}
+            
+            transfer = self.token_contract.functions.transfer(
+                Web3.to_checksum_address(to_address),
+                amount_wei
+            )
+            # Refuse transfers that would revert before paying gas for them
+            self.gas.simulate(transfer, sender_address)
+            # Paying an address that already holds tokens is cheaper than a first transfer
+            shape = ('funded',) if self.get_balance(to_address) > 0 else ('new',)
+            gas_limit = self.gas.estimate(transfer, sender_address, shape)
+            
+            signed = {}
+            
+            def sign(nonce):
+                signed['nonce'] = nonce
+                transaction = transfer.build_transaction({
+                    'from': sender_address,
+                    'gas': gas_limit,
+                    'gasPrice': self.gas_oracle.price(),
+                    'nonce': nonce,
+                    'chainId': CHAIN_ID
+                })
+                
+                # Signed here, broadcast by the nonce manager
+                return self.w3.eth.account.sign_transaction(transaction, from_private_key)
+            
+            tx_hash = self.nonces.send(sender_address, sign)
+            balance_cache.on_transfer(SLH_TOKEN_ADDRESS, sender_address, to_address)
+            
+            return {
+                'success': True,
+                'tx_hash': self.w3.to_hex(tx_hash),
+                # Lets the receipt tracker tell a dropped transaction from a slow one
+                'from': sender_address,
+                'nonce': signed['nonce'],
+                'explorer_url': f'https://bscscan.com/tx/{self.w3.to_hex(tx_hash)}'
+            }
+            
+        except Exception as e:
+            logger.error(f"Transfer error: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    def validate_wallet_address(self, address):
+        return Web3.is_address(address)
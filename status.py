@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def webhook_info_dict(info):
+    last_error_date = info.last_error_date
+    if hasattr(last_error_date, 'timestamp'):
+        last_error_date = int(last_error_date.timestamp())
+    return {
+        "url": info.url,
+        "pending_update_count": info.pending_update_count,
+        "last_error_date": last_error_date,
+        "last_error_message": info.last_error_message,
+        "max_connections": info.max_connections,
+    }
+
+
+def rpc_health(w3):
+    block = w3.eth.get_block('latest')
+    return {"block_number": block['number'], "block_age": int(time.time()) - block['timestamp']}
+
+
+class StatusMonitor:
+    # Cached status snapshot for health probes. Remote state (bot identity,
+    # webhook info, RPC health) is refreshed in the background, local gauges
+    # (queue depths etc.) are read when the snapshot is built, so serving
+    # / and /status never does network I/O.
+    def __init__(self, interval=30):
+        self.interval = interval
+        self.started_at = time.time()
+        self.identity = None
+        self._identity_fetch = None
+        self._checks = {}
+        self._results = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def set_identity_source(self, fetch):
+        self._identity_fetch = fetch
+
+    def set_identity(self, user):
+        self.identity = {"id": user.id, "username": user.username, "first_name": user.first_name}
+
+    def add_check(self, name, func):
+        self._checks[name] = func
+
+    def add_gauge(self, name, func):
+        self._gauges[name] = func
+
+    def record(self, name, value=None, error=None, latency=None):
+        result = {"ok": error is None, "checked_at": int(time.time())}
+        if latency is not None:
+            result["latency_ms"] = round(latency * 1000, 1)
+        if error is not None:
+            result["error"] = str(error)
+            previous = self._results.get(name) or {}
+            if "value" in previous:
+                # Keep the last good value around, marked stale
+                result["value"] = previous["value"]
+                result["stale"] = True
+        else:
+            result["value"] = value
+        with self._lock:
+            self._results[name] = result
+
+    def run_check(self, name):
+        started = time.monotonic()
+        try:
+            value = self._checks[name]()
+        except Exception as e:
+            logger.warning(f"Status check {name} failed: {e}")
+            self.record(name, error=e, latency=time.monotonic() - started)
+        else:
+            self.record(name, value, latency=time.monotonic() - started)
+
+    def refresh(self):
+        if self.identity is None and self._identity_fetch:
+            try:
+                self.set_identity(self._identity_fetch())
+            except Exception as e:
+                logger.warning(f"Could not fetch bot identity: {e}")
+        for name in list(self._checks):
+            self.run_check(name)
+
+    def _loop(self):
+        while True:
+            self.refresh()
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._loop, name='status-monitor', daemon=True)
+        self._thread.start()
+
+    def bot_username(self):
+        if self.identity and self.identity.get("username"):
+            return f"@{self.identity['username']}"
+        return None
+
+    def check(self, name):
+        with self._lock:
+            return self._results.get(name)
+
+    def value(self, name, default=None):
+        result = self.check(name)
+        if result and "value" in result:
+            return result["value"]
+        return default
+
+    def snapshot(self):
+        with self._lock:
+            checks = dict(self._results)
+        gauges = {}
+        for name, func in self._gauges.items():
+            try:
+                gauges[name] = func()
+            except Exception as e:
+                gauges[name] = {"error": str(e)}
+        return {
+            "identity": self.identity,
+            "uptime": int(time.time() - self.started_at),
+            "checks": checks,
+            **gauges,
+        }
@@ -0,0 +1,158 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from config import DB_COMMIT_WINDOW_MS, DB_COMMIT_BATCH, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS, DB_CACHE_MB
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the writer's queue
+_STOP = object()
+
+
+class SQLiteEngine:
+    # One SQLite file in WAL mode. Every thread reads through its own
+    # connection (read-only, so readers never block each other or the writer);
+    # all writes go to a single writer thread that applies whatever arrived
+    # within `window` seconds (at most max_batch jobs) in one transaction and
+    # commits once, so concurrent handlers share a single fsync. Each job is
+    # atomic on its own: a failing job is rolled back to its savepoint without
+    # taking the rest of the batch with it. write() returns after the commit.
+    def __init__(self, path, window=DB_COMMIT_WINDOW_MS / 1000, max_batch=DB_COMMIT_BATCH,
+                 synchronous=DB_SYNCHRONOUS, busy_timeout_ms=DB_BUSY_TIMEOUT_MS, cache_mb=DB_CACHE_MB):
+        self.path = path
+        self.window = window
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_mb = cache_mb
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.readers = 0
+        self.jobs = 0
+        self.commits = 0
+        self.max_batch_seen = 0
+        self.errors = 0
+        self._writer = self._connect()
+        self._writer.execute('PRAGMA journal_mode=WAL')
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def _connect(self, read_only=False):
+        # Autocommit mode; transactions are explicit
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_mb * 1024)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        if read_only:
+            conn.execute('PRAGMA query_only=ON')
+        return conn
+
+    def reader(self):
+        # This thread's read connection
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect(read_only=True)
+            with self._lock:
+                self.readers += 1
+        return conn
+
+    def read(self, sql, params=()):
+        return self.reader().execute(sql, params).fetchall()
+
+    def read_one(self, sql, params=()):
+        return self.reader().execute(sql, params).fetchone()
+
+    def run(self, work):
+        # work(conn) runs atomically inside the writer's transaction; returns its result
+        future = Future()
+        self._queue.put((work, future))
+        return future.result()
+
+    def write(self, statements):
+        # statements: [(sql, params)] applied atomically; returns each rowcount
+        statements = list(statements)
+        if not statements:
+            return []
+        return self.run(lambda conn: [conn.execute(sql, params).rowcount for sql, params in statements])
+
+    def execute(self, sql, params=()):
+        return self.write([(sql, params)])[0]
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stopping = _STOP in batch
+            jobs = [job for job in batch if job is not _STOP]
+            if jobs:
+                self._commit(jobs)
+        self._writer.close()
+
+    def _commit(self, jobs):
+        conn = self._writer
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for work, future in jobs:
+                conn.execute('SAVEPOINT job')
+                try:
+                    result = work(conn)
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    results.append((future, None, e))
+                else:
+                    conn.execute('RELEASE job')
+                    results.append((future, result, None))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # Nothing in this batch was written
+            logger.error(f"SQLite group commit failed for {self.path}: {e}")
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            with self._lock:
+                self.errors += len(jobs)
+            for _, future in jobs:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.jobs += len(jobs)
+            self.commits += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(jobs))
+            self.errors += sum(1 for _, _, error in results if error is not None)
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "readers": self.readers,
+                "writes": self.jobs,
+                "commits": self.commits,
+                "avg_batch": round(self.jobs / self.commits, 2) if self.commits else 0,
+                "max_batch": self.max_batch_seen,
+                "queued": self._queue.qsize(),
+                "errors": self.errors,
+            }
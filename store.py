@@ -1,6 +1,6 @@
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, Session, select
 from typing import Optional
-from config import DATABASE_URL
+from engine import make_engine, register_migrations
 from datetime import datetime
 
 class Product(SQLModel, table=True):
@@ -11,10 +11,17 @@ class Product(SQLModel, table=True):
     image_ipfs: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
-engine = create_engine(DATABASE_URL, echo=False)
+engine = make_engine()
 
-def init_db():
-    SQLModel.metadata.create_all(engine)
+# Append new versions, never edit applied ones
+MIGRATIONS = [
+    (1, 'product table', [lambda conn: Product.__table__.create(conn, checkfirst=True)]),
+    (2, 'owner index', [
+        'CREATE INDEX IF NOT EXISTS ix_product_owner_telegram_id ON product (owner_telegram_id)',
+    ]),
+]
+
+register_migrations('store', MIGRATIONS)
 
 def add_product(owner_telegram_id: int, name: str, price_slh: float, image_ipfs: str = None):
     with Session(engine) as s:
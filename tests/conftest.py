@@ -0,0 +1,87 @@
+import importlib
+import json
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _missing(name):
+    try:
+        importlib.import_module(name)
+        return False
+    except ImportError:
+        return True
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+# Stand-ins for the third-party packages the modules under test import at
+# load time. The tests never reach the network, so only the names matter;
+# installed packages are used as they are.
+if _missing('dotenv'):
+    _module('dotenv', load_dotenv=lambda *args, **kwargs: False)
+
+if _missing('web3'):
+    class Web3:
+        @staticmethod
+        def to_checksum_address(address):
+            return address
+
+        @staticmethod
+        def to_hex(value):
+            return value if isinstance(value, str) else '0x' + bytes(value).hex()
+
+    class HTTPProvider:
+        def __init__(self, *args, **kwargs):
+            pass
+
+    _module('web3', Web3=Web3, HTTPProvider=HTTPProvider)
+    _module('web3._utils')
+    _module('web3._utils.encoding', Web3JsonEncoder=json.JSONEncoder)
+
+if _missing('requests'):
+    class RequestException(IOError):
+        pass
+
+    class ConnectionError(RequestException):
+        pass
+
+    class Timeout(RequestException):
+        pass
+
+    class ConnectTimeout(ConnectionError, Timeout):
+        pass
+
+    class ReadTimeout(Timeout):
+        pass
+
+    class Session:
+        def post(self, *args, **kwargs):
+            raise ConnectionError("no network in tests")
+
+    exceptions = _module('requests.exceptions', RequestException=RequestException, ConnectionError=ConnectionError,
+                         Timeout=Timeout, ConnectTimeout=ConnectTimeout, ReadTimeout=ReadTimeout)
+    _module('requests', Session=Session, exceptions=exceptions)
+
+if _missing('urllib3'):
+    class ConnectTimeoutError(Exception):
+        pass
+
+    _module('urllib3')
+    _module('urllib3.exceptions', ConnectTimeoutError=ConnectTimeoutError)
+
+if _missing('telegram'):
+    class RetryAfter(Exception):
+        def __init__(self, retry_after):
+            super().__init__(f"Flood control exceeded. Retry in {retry_after} seconds")
+            self.retry_after = retry_after
+
+    _module('telegram')
+    _module('telegram.error', RetryAfter=RetryAfter)
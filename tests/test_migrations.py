@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from database import MIGRATIONS
+from migrations import migrate_sqlite
+from storage import SQLiteEngine
+
+# slh_platform.db as bot.py created it before versioned migrations, with the
+# receipt columns some deployments already added by hand
+LEGACY_SCHEMA = '''
+    CREATE TABLE users (
+        user_id INTEGER PRIMARY KEY, username TEXT, first_name TEXT, last_name TEXT, wallet_address TEXT,
+        phone TEXT, website TEXT, materials TEXT, total_gifts_sent REAL DEFAULT 0,
+        total_gifts_received REAL DEFAULT 0, joined_group BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE gifts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, from_user_id INTEGER, to_user_id INTEGER, amount REAL,
+        message TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, from_user_id INTEGER, to_user_id INTEGER, amount REAL,
+        tx_hash TEXT, status TEXT DEFAULT 'pending', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        block_number INTEGER
+    );
+    CREATE TABLE contracts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, creator_id INTEGER, title TEXT, description TEXT,
+        status TEXT DEFAULT 'active', created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT INTO users (user_id, username) VALUES (1, 'alice');
+    INSERT INTO transactions (from_user_id, to_user_id, amount, tx_hash) VALUES (1, 2, 5.0, '0xabc');
+'''
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SQLiteEngine(str(tmp_path / 'slh_platform.db'))
+    yield engine
+    engine.close()
+
+
+def columns(engine, table):
+    return {row[1] for row in engine.read(f'PRAGMA table_info({table})')}
+
+
+def indexes(engine):
+    return {row[0] for row in engine.read("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database_gets_every_version(engine):
+    assert migrate_sqlite(engine, 'slh_platform', MIGRATIONS) == [1, 2, 3, 4]
+    assert {'block_number', 'gas_used', 'settled_at', 'from_address', 'nonce'} <= columns(engine, 'transactions')
+    assert {'idx_users_wallet_address', 'idx_transactions_pending'} <= indexes(engine)
+    # Applied versions are recorded and never run again
+    assert migrate_sqlite(engine, 'slh_platform', MIGRATIONS) == []
+
+
+def test_legacy_database_is_upgraded_in_place(tmp_path):
+    path = str(tmp_path / 'slh_platform.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+
+    engine = SQLiteEngine(path)
+    try:
+        assert migrate_sqlite(engine, 'slh_platform', MIGRATIONS) == [1, 2, 3, 4]
+        assert {'gas_used', 'settled_at', 'from_address', 'nonce'} <= columns(engine, 'transactions')
+        assert engine.read_one('SELECT username FROM users WHERE user_id = 1') == ('alice',)
+        assert engine.read_one('SELECT tx_hash, nonce FROM transactions') == ('0xabc', None)
+    finally:
+        engine.close()
+
+
+def test_failing_step_rolls_back_the_whole_run(engine):
+    migrations = [
+        (1, 'table', ['CREATE TABLE things (id INTEGER PRIMARY KEY)']),
+        (2, 'broken', ['ALTER TABLE things ADD COLUMN name TEXT', 'ALTER TABLE missing ADD COLUMN x TEXT']),
+    ]
+    with pytest.raises(sqlite3.OperationalError):
+        migrate_sqlite(engine, 'things', migrations)
+    # The whole run is one job, so not even version 1 stuck
+    assert engine.read("SELECT name FROM sqlite_master WHERE name = 'things'") == []
+    assert migrate_sqlite(engine, 'things', migrations[:1]) == [1]
+    assert columns(engine, 'things') == {'id'}
+
+
+def test_versions_must_increase(engine):
+    with pytest.raises(ValueError):
+        migrate_sqlite(engine, 'things', [(2, 'b', []), (1, 'a', [])])
+
+
+def test_components_are_versioned_separately(engine):
+    assert migrate_sqlite(engine, 'one', [(1, 'a', ['CREATE TABLE one (id INTEGER)'])]) == [1]
+    assert migrate_sqlite(engine, 'two', [(1, 'a', ['CREATE TABLE two (id INTEGER)'])]) == [1]
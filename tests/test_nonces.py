@@ -0,0 +1,138 @@
+import types
+
+import pytest
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+from nonces import NonceManager
+
+ADDRESS = '0x' + '11' * 20
+
+
+class FakeEth:
+    def __init__(self, pending=5, latest=5):
+        self.pending = pending
+        self.latest = latest
+        self.errors = []
+        self.sent = []
+
+    def get_transaction_count(self, address, block):
+        return self.pending if block == 'pending' else self.latest
+
+    def send_raw_transaction(self, raw):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append(raw)
+        return b'\x01' + raw
+
+
+def signer(signed):
+    def sign(nonce):
+        tx = types.SimpleNamespace(rawTransaction=bytes([nonce]), hash=b'\x02' + bytes([nonce]))
+        signed.append(nonce)
+        return tx
+    return sign
+
+
+@pytest.fixture
+def eth():
+    return FakeEth()
+
+
+@pytest.fixture
+def manager(eth):
+    return NonceManager(types.SimpleNamespace(eth=eth))
+
+
+def test_nonces_are_handed_out_locally(manager):
+    assert [manager.allocate(ADDRESS) for _ in range(3)] == [5, 6, 7]
+    assert manager.stats()['resyncs'] == 1
+
+
+def test_release_of_the_last_nonce_hands_it_out_again(manager):
+    manager.allocate(ADDRESS)
+    nonce = manager.allocate(ADDRESS)
+    manager.release(ADDRESS, nonce)
+    assert manager.allocate(ADDRESS) == nonce
+
+
+def test_release_behind_later_nonces_resyncs(manager, eth):
+    first = manager.allocate(ADDRESS)
+    manager.allocate(ADDRESS)
+    manager.release(ADDRESS, first)
+    eth.pending = 6
+    # The pending count shows the gap
+    assert manager.allocate(ADDRESS) == 6
+    assert manager.stats()['resyncs'] == 2
+
+
+def test_send_tracks_the_nonce(manager, eth):
+    signed = []
+    tx_hash = manager.send(ADDRESS, signer(signed))
+    assert tx_hash == b'\x01\x05'
+    assert signed == [5]
+    assert manager.stats()['in_flight'] == 1
+    manager.complete(ADDRESS, nonce=5)
+    assert manager.stats()['in_flight'] == 0
+
+
+def test_signing_failure_releases_the_nonce(manager):
+    def sign(nonce):
+        raise RuntimeError("no key")
+    with pytest.raises(RuntimeError):
+        manager.send(ADDRESS, sign)
+    assert manager.allocate(ADDRESS) == 5
+
+
+def test_node_error_answer_releases_the_nonce(manager, eth):
+    eth.errors.append(ValueError({'code': -32000, 'message': 'insufficient funds for gas'}))
+    with pytest.raises(ValueError):
+        manager.send(ADDRESS, signer([]))
+    assert manager.allocate(ADDRESS) == 5
+
+
+@pytest.mark.parametrize('error', [
+    requests.exceptions.ConnectTimeout('connect timed out'),
+    requests.exceptions.ConnectionError(types.SimpleNamespace(reason=ConnectTimeoutError('connect timed out'))),
+])
+def test_connect_failure_releases_the_nonce(manager, eth, error):
+    eth.errors.append(error)
+    with pytest.raises(type(error)):
+        manager.send(ADDRESS, signer([]))
+    assert manager.allocate(ADDRESS) == 5
+    assert manager.stats()['unconfirmed'] == 0
+
+
+@pytest.mark.parametrize('error', [
+    requests.exceptions.ReadTimeout('read timed out'),
+    requests.exceptions.ConnectionError('connection reset by peer'),
+])
+def test_ambiguous_failure_keeps_the_nonce(manager, eth, error):
+    eth.errors.append(error)
+    # The transaction may be in a mempool: its hash comes back for the receipt tracker
+    assert manager.send(ADDRESS, signer([])) == b'\x02\x05'
+    assert manager.allocate(ADDRESS) == 6
+    assert manager.stats()['unconfirmed'] == 1
+    assert manager.stats()['in_flight'] == 1
+
+
+def test_already_known_is_a_successful_send(manager, eth):
+    eth.errors.append(ValueError({'code': -32000, 'message': 'already known'}))
+    signed = []
+    assert manager.send(ADDRESS, signer(signed)) == b'\x02\x05'
+    assert signed == [5]
+    assert manager.allocate(ADDRESS) == 6
+
+
+def test_nonce_error_resyncs_and_retries_once(manager, eth):
+    manager.resync(ADDRESS)
+    # Something else sent from this wallet meanwhile
+    eth.errors.append(ValueError({'code': -32000, 'message': 'nonce too low'}))
+    eth.pending = 8
+    signed = []
+    assert manager.send(ADDRESS, signer(signed)) == b'\x01\x08'
+    assert signed == [5, 8]
+
+    eth.errors.extend([ValueError('nonce too low'), ValueError('nonce too low')])
+    with pytest.raises(ValueError):
+        manager.send(ADDRESS, signer([]))
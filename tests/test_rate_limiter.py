@@ -0,0 +1,88 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from outbox import RateLimiter, PRIORITY_TRANSACTIONAL, PRIORITY_BULK
+
+
+def drain(limiter):
+    for _ in range(int(limiter.global_bucket.capacity)):
+        limiter.acquire(0)
+
+
+def test_higher_lanes_go_first():
+    limiter = RateLimiter(global_rate=20, chat_rate=100, chat_burst=100)
+    drain(limiter)
+    order = []
+
+    def send(chat_id, priority, tag):
+        limiter.acquire(chat_id, priority)
+        order.append(tag)
+
+    threads = []
+    for i in range(3):
+        threads.append(threading.Thread(target=send, args=(100 + i, PRIORITY_BULK, f'bulk{i}')))
+        threads[-1].start()
+        time.sleep(0.005)
+    for i in range(2):
+        threads.append(threading.Thread(target=send, args=(200 + i, PRIORITY_TRANSACTIONAL, f'tx{i}')))
+        threads[-1].start()
+        time.sleep(0.005)
+    for thread in threads:
+        thread.join(5)
+    assert order == ['tx0', 'tx1', 'bulk0', 'bulk1', 'bulk2']
+    assert limiter.stats()['waiting'] == {'transactional': 0, 'normal': 0, 'bulk': 0}
+
+
+def test_chat_limit_spaces_sends():
+    limiter = RateLimiter(global_rate=1000, chat_rate=20, chat_burst=1)
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire(1)
+    assert time.monotonic() - started == pytest.approx(0.15, abs=0.05)
+
+
+def test_waiting_chat_does_not_hold_up_others():
+    limiter = RateLimiter(global_rate=1000, chat_rate=1, chat_burst=1)
+    limiter.acquire(1)
+    blocked = threading.Thread(target=limiter.acquire, args=(1, PRIORITY_TRANSACTIONAL), daemon=True)
+    blocked.start()
+    time.sleep(0.01)
+    started = time.monotonic()
+    limiter.acquire(2)
+    assert time.monotonic() - started < 0.1
+    blocked.join(2)
+
+
+def test_cancelled_waiter_passes_the_turn_on():
+    async def main():
+        limiter = RateLimiter(global_rate=5, chat_rate=100, chat_burst=100)
+        for _ in range(5):
+            await limiter.acquire_async(0)
+        first = asyncio.create_task(limiter.acquire_async(1))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(limiter.acquire_async(2))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+        assert limiter.stats()['waiting'] == {'transactional': 0, 'normal': 0, 'bulk': 0}
+
+    asyncio.run(main())
+
+
+def test_retry_after_blocks_the_chat_and_retries():
+    limiter = RateLimiter(global_rate=1000, chat_rate=1000, chat_burst=1000)
+    calls = []
+
+    def send():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise RetryAfter(0.1)
+        return 'ok'
+
+    assert limiter.call(1, send) == 'ok'
+    assert calls[1] - calls[0] >= 0.09
+    assert limiter.stats()['retries'] == 1
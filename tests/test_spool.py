@@ -0,0 +1,43 @@
+import json
+
+from ingest import UpdateQueue, UpdateSpool, spooled_chat_id
+
+
+def test_unacked_updates_are_replayed_in_order(tmp_path):
+    path = str(tmp_path / 'spool.db')
+    spool = UpdateSpool(path)
+    ids = [spool.append(json.dumps({"update_id": n})) for n in range(3)]
+    spool.ack(ids[1])
+    assert spool.depth() == 2
+
+    # A restart finds what was never acked
+    spool = UpdateSpool(path)
+    assert spool.depth() == 2
+    replayed = []
+    queue = UpdateQueue(replayed.append, key_func=spooled_chat_id)
+    queue.start()
+    try:
+        assert spool.replay(queue) == 2
+        assert queue.wait_idle(5)
+    finally:
+        queue.stop()
+    assert replayed == [(ids[0], {"update_id": 0}), (ids[2], {"update_id": 2})]
+
+
+def test_replay_ignores_the_queue_limit(tmp_path):
+    spool = UpdateSpool(str(tmp_path / 'spool.db'))
+    for n in range(5):
+        spool.append(json.dumps({"update_id": n}))
+    queue = UpdateQueue(lambda entry: None, maxsize=1, key_func=spooled_chat_id)
+    assert spool.replay(queue) == 5
+    assert queue.stats()['depth'] == 5
+    assert queue.stats()['rejected'] == 0
+
+
+def test_acked_entries_are_gone(tmp_path):
+    path = str(tmp_path / 'spool.db')
+    spool = UpdateSpool(path)
+    spool.ack(spool.append(json.dumps({"update_id": 1})))
+    assert spool.pending() == []
+    assert UpdateSpool(path).depth() == 0
+    assert spool.stats()['acked'] == 1
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from ingest import UpdateQueue, ACCEPTED, SHED, REJECTED
+
+
+def message(chat_id, n):
+    return {"update_id": n, "message": {"chat": {"id": chat_id}, "text": str(n)}}
+
+
+def test_updates_of_one_chat_run_in_order():
+    seen = []
+    lock = threading.Lock()
+
+    def handler(payload):
+        # Later updates finish faster, so any overtaking would show
+        time.sleep(0.001 * (20 - payload['update_id'] % 20))
+        with lock:
+            seen.append((payload['message']['chat']['id'], payload['update_id']))
+
+    q = UpdateQueue(handler, workers=4)
+    q.start()
+    try:
+        for n in range(40):
+            q.submit(message(n % 2, n))
+        assert q.wait_idle(5)
+    finally:
+        q.stop()
+    for chat_id in (0, 1):
+        ids = [n for chat, n in seen if chat == chat_id]
+        assert ids == sorted(ids) and len(ids) == 20
+
+
+def test_chats_run_in_parallel():
+    slow_started = threading.Event()
+    release = threading.Event()
+    done = []
+
+    def handler(payload):
+        if payload['message']['chat']['id'] == 1:
+            slow_started.set()
+            release.wait(5)
+        done.append(payload['update_id'])
+
+    q = UpdateQueue(handler, workers=2)
+    q.start()
+    try:
+        q.submit(message(1, 1))
+        assert slow_started.wait(5)
+        q.submit(message(2, 2))
+        deadline = time.monotonic() + 5
+        while 2 not in done and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Chat 2 went through while chat 1 was still busy
+        assert done == [2]
+        release.set()
+        assert q.wait_idle(5)
+    finally:
+        release.set()
+        q.stop()
+
+
+def test_full_queue_rejects_or_sheds():
+    rejecting = UpdateQueue(lambda payload: None, maxsize=1)
+    assert rejecting.offer(message(1, 1)) == ACCEPTED
+    assert rejecting.offer(message(1, 2)) == REJECTED
+    assert rejecting.submit(message(1, 3)) is False
+    # Replays skip the limit
+    assert rejecting.offer(message(1, 4), force=True) == ACCEPTED
+
+    shedding = UpdateQueue(lambda payload: None, maxsize=1, policy='shed')
+    shedding.offer(message(1, 1))
+    assert shedding.offer(message(1, 2)) == SHED
+    assert shedding.submit(message(1, 3)) is True
+    assert shedding.stats()['shed'] == 2
+
+
+def test_claim_holds_back_updates_until_release():
+    seen = []
+    q = UpdateQueue(lambda payload: seen.append(payload['update_id']), workers=2)
+    q.start()
+    try:
+        assert q.claim(7)
+        # Claimed chats can't be claimed twice
+        assert not q.claim(7)
+        q.submit(message(7, 1))
+        q.submit(message(7, 2))
+        time.sleep(0.05)
+        assert seen == []
+        q.release(7)
+        assert q.wait_idle(5)
+        assert seen == [1, 2]
+        assert not q.has_pending(7)
+    finally:
+        q.stop()
+
+
+def test_claim_fails_while_chat_is_busy():
+    release = threading.Event()
+    q = UpdateQueue(lambda payload: release.wait(5), workers=1)
+    q.start()
+    try:
+        q.submit(message(3, 1))
+        assert q.has_pending(3)
+        assert not q.claim(3)
+        release.set()
+        assert q.wait_idle(5)
+        assert q.claim(3)
+        q.release(3)
+        assert not q.has_pending(3)
+    finally:
+        release.set()
+        q.stop()
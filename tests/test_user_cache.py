@@ -0,0 +1,68 @@
+import pytest
+
+from database import UserDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = UserDatabase(str(tmp_path / 'slh_platform.db'), cache_size=2)
+    yield db
+    db.engine.close()
+
+
+def test_reads_are_cached(db):
+    db.add_user(1, 'alice', 'Alice', None)
+    first = db.get_user(1)
+    assert db.get_user(1) is first
+    assert (db.hits, db.misses) == (1, 1)
+    assert db.get_user(2) is None
+    # Missing users are not cached
+    assert db.get_user(2) is None
+    assert db.misses == 3
+
+
+def test_writes_invalidate_the_cached_record(db):
+    db.add_user(1, 'alice', 'Alice', None)
+    db.get_user(1)
+    db.update_wallet(1, '0xabc')
+    assert db.get_user(1).wallet_address == '0xabc'
+    db.update_contact_info(1, '123', 'example.org', 'docs')
+    assert db.get_user(1).website == 'example.org'
+    db.add_user(1, 'alice2', 'Alice', None)
+    assert db.get_user(1).username == 'alice2'
+    db.add_users([(1, 'alice3', 'Alice', None)])
+    assert db.get_user(1).username == 'alice3'
+
+
+def test_joining_the_group_patches_the_cached_record(db):
+    db.add_user(1, 'alice', 'Alice', None)
+    record = db.get_user(1)
+    db.mark_joined_group(1)
+    assert db.get_user(1) is record
+    assert record.joined_group is True
+
+
+def test_load_overlapping_a_write_is_not_cached(db, monkeypatch):
+    db.add_user(1, 'alice', 'Alice', None)
+    read_one = db.engine.read_one
+
+    def racing_read(sql, params=()):
+        # The row is read, then a write commits before it reaches the cache
+        row = read_one(sql, params)
+        db.update_wallet(1, '0xnew')
+        return row
+
+    monkeypatch.setattr(db.engine, 'read_one', racing_read)
+    assert db.get_user(1).wallet_address is None
+    monkeypatch.undo()
+    assert db.get_user(1).wallet_address == '0xnew'
+
+
+def test_cache_is_bounded(db):
+    for user_id in (1, 2, 3):
+        db.add_user(user_id, f'user{user_id}', None, None)
+        db.get_user(user_id)
+    db.get_user(1)
+    assert db.misses == 4
+    assert db.get_user(3) is not None
+    assert db.hits == 1
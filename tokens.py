@@ -0,0 +1,119 @@
+import logging
+import sqlite3
+import threading
+import time
+from web3 import Web3
+from config import TOKEN_METADATA_PATH
+
+logger = logging.getLogger(__name__)
+
+# ERC-20 metadata getters only
+METADATA_ABI = [
+    {"constant": True, "inputs": [], "name": "decimals", "outputs": [{"name": "", "type": "uint8"}], "type": "function"},
+    {"constant": True, "inputs": [], "name": "symbol", "outputs": [{"name": "", "type": "string"}], "type": "function"},
+    {"constant": True, "inputs": [], "name": "name", "outputs": [{"name": "", "type": "string"}], "type": "function"},
+    {"constant": True, "inputs": [], "name": "totalSupply", "outputs": [{"name": "", "type": "uint256"}], "type": "function"},
+]
+
+
+class TokenRegistry:
+    # decimals/symbol/name/totalSupply per token contract, read from the chain
+    # once and kept in SQLite, so balance reads and transfers never ask the RPC
+    # for them again. Failed lookups are not stored and are retried next time.
+    def __init__(self, path=TOKEN_METADATA_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS token_metadata (
+                address TEXT PRIMARY KEY,
+                decimals INTEGER NOT NULL,
+                symbol TEXT,
+                name TEXT,
+                total_supply TEXT,
+                fetched_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.fetches = 0
+        self.errors = 0
+        for row in self.conn.execute(
+            'SELECT address, decimals, symbol, name, total_supply, fetched_at FROM token_metadata'
+        ).fetchall():
+            self._tokens[row[0]] = self._row_to_dict(row)
+
+    def _row_to_dict(self, row):
+        address, decimals, symbol, name, total_supply, fetched_at = row
+        return {
+            "address": address,
+            "decimals": decimals,
+            "symbol": symbol,
+            "name": name,
+            # Stored as text, uint256 does not fit an SQLite integer
+            "total_supply": int(total_supply) if total_supply is not None else None,
+            "fetched_at": fetched_at,
+        }
+
+    def _fetch(self, w3, address):
+        contract = w3.eth.contract(address=address, abi=METADATA_ABI)
+        decimals = contract.functions.decimals().call()
+        # symbol/name/totalSupply are optional in ERC-20, decimals is what we need
+        optional = {}
+        for field, function in (("symbol", "symbol"), ("name", "name"), ("total_supply", "totalSupply")):
+            try:
+                optional[field] = getattr(contract.functions, function)().call()
+            except Exception as e:
+                logger.warning(f"Token {address} has no {function}(): {e}")
+                optional[field] = None
+        row = (address, decimals, optional["symbol"], optional["name"],
+               str(optional["total_supply"]) if optional["total_supply"] is not None else None, time.time())
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO token_metadata (address, decimals, symbol, name, total_supply, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)', row
+            )
+            self.conn.commit()
+            self.fetches += 1
+        return self._row_to_dict(row)
+
+    def get(self, w3, address, refresh=False):
+        address = Web3.to_checksum_address(address)
+        self.lookups += 1
+        token = self._tokens.get(address)
+        if token is None or refresh:
+            token = self._fetch(w3, address)
+            self._tokens[address] = token
+        return token
+
+    def decimals(self, w3, address, default=18):
+        try:
+            return self.get(w3, address)["decimals"]
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Could not resolve decimals for {address}: {e}")
+            return default
+
+    def warm(self, w3, addresses):
+        # Resolve everything up front so the first user request doesn't pay for it
+        for address in addresses:
+            if not address:
+                continue
+            try:
+                token = self.get(w3, address)
+                logger.info(f"✅ Token {token['symbol']} ({token['address']}): {token['decimals']} decimals")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Could not warm up token {address}: {e}")
+
+    def stats(self):
+        return {
+            "tokens": len(self._tokens),
+            "lookups": self.lookups,
+            "fetches": self.fetches,
+            "errors": self.errors,
+        }
+
+
+token_registry = TokenRegistry()
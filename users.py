@@ -1,17 +1,46 @@
-from sqlmodel import SQLModel, Field, create_engine, Session, select
+from sqlmodel import SQLModel, Field, Session, select
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
 from typing import Optional
-from config import DATABASE_URL
+from engine import make_engine, register_migrations
+
+# Rows per bulk upsert statement (2 bound parameters each), under the
+# SQLite and Postgres bind parameter limits
+UPSERT_CHUNK = 5000
 
 # מודל משתמש פשוט
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    telegram_id: int
+    # Unique, as migration 3 makes existing tables; the upserts conflict on it
+    telegram_id: int = Field(unique=True)
     wallet_address: Optional[str] = None
 
-engine = create_engine(DATABASE_URL, echo=False)
+engine = make_engine()
+
+# Append new versions, never edit applied ones
+MIGRATIONS = [
+    (1, 'user table', [lambda conn: User.__table__.create(conn, checkfirst=True)]),
+    (2, 'telegram_id index', [
+        'CREATE INDEX IF NOT EXISTS ix_user_telegram_id ON "user" (telegram_id)',
+    ]),
+    (3, 'unique telegram_id', [
+        # Racing create_or_update_user calls could insert a user twice: keep
+        # the first row with the newest wallet
+        '''
+        UPDATE "user" SET wallet_address = (
+            SELECT newer.wallet_address FROM "user" AS newer
+            WHERE newer.telegram_id = "user".telegram_id AND newer.wallet_address IS NOT NULL
+            ORDER BY newer.id DESC LIMIT 1
+        )
+        WHERE telegram_id IN (SELECT telegram_id FROM "user" GROUP BY telegram_id HAVING COUNT(*) > 1)
+        ''',
+        'DELETE FROM "user" WHERE id NOT IN (SELECT MIN(id) FROM "user" GROUP BY telegram_id)',
+        'CREATE UNIQUE INDEX IF NOT EXISTS ux_user_telegram_id ON "user" (telegram_id)',
+        'DROP INDEX IF EXISTS ix_user_telegram_id',
+    ]),
+]
 
-def init_db():
-    SQLModel.metadata.create_all(engine)
+register_migrations('users', MIGRATIONS)
 
 def get_user_by_telegram(telegram_id: int):
     with Session(engine) as s:
@@ -19,18 +48,33 @@ def get_user_by_telegram(telegram_id: int):
         res = s.exec(stmt).first()
         return res
 
+def _upsert(rows):
+    # INSERT ... ON CONFLICT (telegram_id) DO UPDATE; a missing wallet never
+    # overwrites a stored one
+    dialect = postgresql if engine.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(User.__table__).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=['telegram_id'],
+        set_={'wallet_address': func.coalesce(stmt.excluded.wallet_address, User.__table__.c.wallet_address)}
+    )
+
 def create_or_update_user(telegram_id: int, wallet_address: str = None):
-    with Session(engine) as s:
-        user = get_user_by_telegram(telegram_id)
-        if not user:
-            user = User(telegram_id=telegram_id, wallet_address=wallet_address)
-            s.add(user)
-            s.commit()
-            s.refresh(user)
-            return user
-        if wallet_address:
-            user.wallet_address = wallet_address
-            s.add(user)
-            s.commit()
-            s.refresh(user)
-        return user
+    # One statement and one round-trip, returning the stored row
+    stmt = _upsert([{'telegram_id': telegram_id, 'wallet_address': wallet_address or None}])
+    with engine.begin() as conn:
+        row = conn.execute(stmt.returning(*User.__table__.c)).one()
+    return User(**row._mapping)
+
+def upsert_users(users):
+    # Bulk variant for imports and group member syncs: (telegram_id, wallet_address)
+    # pairs, one statement per UPSERT_CHUNK users, all in one transaction.
+    # Returns the number of distinct users written.
+    merged = {}
+    for telegram_id, wallet_address in users:
+        # A statement may touch each row only once; the last wallet given wins
+        merged[telegram_id] = wallet_address or merged.get(telegram_id)
+    rows = [{'telegram_id': telegram_id, 'wallet_address': wallet_address} for telegram_id, wallet_address in merged.items()]
+    with engine.begin() as conn:
+        for i in range(0, len(rows), UPSERT_CHUNK):
+            conn.execute(_upsert(rows[i:i + UPSERT_CHUNK]))
+    return len(rows)
@@ -0,0 +1,450 @@
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from config import SLH_TOKEN_ADDRESS, SLH_VALUE_ILS, TELEGRAM_GROUP_URL
+
+# Texts and keyboards shared by bot.py (sync) and async_bot.py (async)
+
+# Conversation States
+SETTING_CONTACT, GIFT_AMOUNT, GIFT_MESSAGE, TRANSFER_AMOUNT, TRANSFER_RECIPIENT = range(5)
+
+# ==================== KEYBOARDS ====================
+def get_main_keyboard():
+    keyboard = [
+        ["👛 הארנק שלי", "🎁 שלח מתנה"],
+        ["💸 העברת SLH", "📊 החוזים שלי"],
+        ["👥 הצטרף לקהילה", "⚙️ הגדרות"],
+        ["📈 סטטיסטיקות", "ℹ️ מידע"]
+    ]
+    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+
+def get_wallet_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("💸 העברת SLH", callback_data="transfer_slh")],
+        [InlineKeyboardButton("📤 הפקדה", callback_data="deposit")],
+        [InlineKeyboardButton("📥 משיכה", callback_data="withdraw")],
+        [InlineKeyboardButton("📊 היסטוריה", callback_data="tx_history")],
+        [InlineKeyboardButton("🔙 חזרה", callback_data="back_main")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_transfer_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("👤 למשתמש בטלגרם", callback_data="transfer_telegram")],
+        [InlineKeyboardButton("🏦 לכתובת ארנק", callback_data="transfer_wallet")],
+        [InlineKeyboardButton("🔙 חזרה", callback_data="back_wallet")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_contracts_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("📋 החוזים הפעילים שלי", callback_data="my_contracts")],
+        [InlineKeyboardButton("✅ החוזים שהושלמו", callback_data="completed_contracts")],
+        [InlineKeyboardButton("🔍 חפש חוזים", callback_data="search_contracts")],
+        [InlineKeyboardButton("🔙 חזרה", callback_data="back_main")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_gift_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("🎁 מתנה מהירה", callback_data="quick_gift")],
+        [InlineKeyboardButton("💌 מתנה עם הודעה", callback_data="gift_with_message")],
+        [InlineKeyboardButton("🔗 מתנה עם חוזה", callback_data="gift_with_contract")],
+        [InlineKeyboardButton("🔙 חזרה", callback_data="back_main")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+def get_settings_keyboard():
+    keyboard = [
+        [InlineKeyboardButton("📞 עדכון פרטי קשר", callback_data="update_contact")],
+        [InlineKeyboardButton("👥 אישור הצטרפות", callback_data="confirm_join")],
+        [InlineKeyboardButton("🔧 ניהול ארנק", callback_data="wallet_management")],
+        [InlineKeyboardButton("🔑 הגדרת Private Key", callback_data="set_private_key")],
+        [InlineKeyboardButton("🔙 חזרה", callback_data="back_main")]
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+# ==================== TEXTS ====================
+def welcome_text(first_name):
+    return f"""
+👋 **ברוך הבא {first_name}!**
+
+**SLH Platform** - הפלטפורמה המלאה למסחר במטבע SLH
+
+💎 **מטבע SLH:** {SLH_VALUE_ILS} ₪
+👥 **קהילה:** {TELEGRAM_GROUP_URL}
+
+**🚀 תכונות מלאות:**
+• 👛 ניהול ארנק מתקדם עם העברות
+• 🎁 שליחת מתנות SLH
+• 💸 העברות ישירות בין משתמשים
+• 📝 יצירת חוזים חכמים
+• 📊 מעקב אחר עסקאות
+• 👥 קהילה פעילה
+
+**בחר אפשרות מהתפריט 👇**
+    """
+
+def wallet_text(user_data, current_balance):
+    return f"""
+**👛 הארנק המלא שלך**
+
+**כתובת ארנק:**
+`{user_data.wallet_address}`
+
+**💰 יתרת SLH:** {current_balance:,.2f} SLH
+**💎 שווי נוכחי:** {current_balance * SLH_VALUE_ILS:,.0f} ₪
+
+**📊 סטטיסטיקות:**
+🎁 מתנות שנשלחו: {user_data.total_gifts_sent:,.0f} SLH
+🎁 מתנות שהתקבלו: {user_data.total_gifts_received:,.0f} SLH
+
+**🚀 פעולות:**
+• לחץ '💸 העברת SLH' לשליחה ישירה
+• לחץ '🎁 שלח מתנה' לשליחת מתנות
+• לחץ '📝 צור חוזה' לעסקאות מורכבות
+        """
+
+NO_WALLET_TEXT = f"""
+**👛 הארנק שלך**
+
+עדיין לא רשומה כתובת ארנק.
+
+**📝 כדי להתחיל:**
+1. שלח את כתובת ה-BSC שלך (מתחיל ב-0x)
+2. הצטרף לקהילה: {TELEGRAM_GROUP_URL}
+3. התחל לסחור ולקבל מתנות!
+
+**🏦 הוראות ארנק:**
+• **רשת:** Binance Smart Chain
+• **כתובת מטבע:** `{SLH_TOKEN_ADDRESS}`
+
+**שלח את כתובת הארנק שלך עכשיו...**
+        """
+
+TRANSFER_MENU_TEXT = f"""
+**💸 מרכז ההעברות של SLH**
+
+**💎 ערך מטבע:** {SLH_VALUE_ILS} ₪
+**👥 קהילה:** {TELEGRAM_GROUP_URL}
+
+**🎯 אפשרויות העברה:**
+• **👤 למשתמש בטלגרם** - העברה ישירה דרך הבוט
+• **🏦 לכתובת ארנק** - העברה לכל כתובת BSC
+
+**⚠️ חשוב:**
+• העברות דורשות Private Key מאובטח
+• כל עסקה נרשמת בבלוקצ'יין
+• עמלות גז נגבות ב-BNB
+
+**💡 טיפ:** הצטרף לקהילה כדי למצוא יותר חברים למסחר!
+    """
+
+TRANSFER_AMOUNT_PROMPT = (
+    "**🏦 העברה לכתובת ארנק**\n\n"
+    "שלח את כמות ה-SLH שברצונך להעביר:\n"
+    "לדוגמה: `100` או `50.5`\n\n"
+    "או שלח 'ביטול' לחזור"
+)
+
+PRIVATE_KEY_REQUIRED_TEXT = (
+    "❌ **נדרש Private Key**\n\n"
+    "להשלמת ההעברה, אנא הגדר את ה-Private Key שלך בהגדרות.\n"
+    "➡️ לחץ '⚙️ הגדרות' -> '🔑 הגדרת Private Key'\n\n"
+    "העברה בוטלה."
+)
+
+def transfer_recipient_prompt(amount):
+    return (
+        f"**כמות:** {amount:,.2f} SLH\n\n"
+        "עכשיו שלח את כתובת הארנק של הנמען:\n"
+        "לדוגמה: `0x742d35Cc6634C0532925a3b8D4B19a5f4B3a7A64`"
+    )
+
+def insufficient_balance_text(sender_balance, amount):
+    return (
+        f"❌ **יתרה לא מספקת!**\n\n"
+        f"**יתרה שלך:** {sender_balance:.2f} SLH\n"
+        f"**נדרש:** {amount:.2f} SLH\n\n"
+        "העברה בוטלה."
+    )
+
+def transfer_confirm_text(to_address, amount):
+    return f"""
+**✅ אישור העברה**
+
+**📤 משלח:** אתה
+**📥 מקבל:** `{to_address}`
+**💰 כמות:** {amount:,.2f} SLH
+**💎 שווי:** {amount * SLH_VALUE_ILS:,.0f} ₪
+
+**⚠️ אישור:** שלח '✅ אישור' להשלמת ההעברה
+**🚫 ביטול:** שלח '❌ ביטול' לביטול
+
+_⛽ העברה כוללת עמלת גז ב-BNB_
+    """
+
+TRANSFER_PENDING_TEXT = "🔄 **מבצע העברה...**\n\n_פעולה זו עשויה לארוך מספר שניות..._"
+
+def transfer_success_text(to_address, amount, result):
+    return f"""
+**✅ ההעברה נשלחה!**
+
+**📤 משלח:** אתה
+**📥 מקבל:** `{to_address}`
+**💰 כמות:** {amount:,.2f} SLH
+**💎 שווי:** {amount * SLH_VALUE_ILS:,.0f} ₪
+**🔗 Hash עסקה:** `{result['tx_hash']}`
+
+**📊 ניתן לעקוב אחר העסקה ב-**
+{result['explorer_url']}
+
+_🕐 העסקה תאושר בעוד מספר דקות_
+                """
+
+def transfer_settled_text(tx_hash, amount, status, receipt):
+    if status == 'confirmed':
+        return f"""
+**✅ ההעברה אושרה בבלוקצ'יין!**
+
+**💰 כמות:** {amount:,.2f} SLH
+**📦 בלוק:** {receipt['blockNumber']}
+**⛽ גז:** {receipt['gasUsed']:,}
+**🔗 Hash עסקה:** `{tx_hash}`
+                """
+    if status == 'failed':
+        return f"""
+**❌ ההעברה נדחתה ברשת**
+
+**💰 כמות:** {amount:,.2f} SLH
+**📦 בלוק:** {receipt['blockNumber']}
+**🔗 Hash עסקה:** `{tx_hash}`
+
+_הטוקנים לא הועברו, עמלת הגז נגבתה_
+                """
+    return f"""
+**⚠️ ההעברה לא נכנסה לבלוק**
+
+**💰 כמות:** {amount:,.2f} SLH
+**🔗 Hash עסקה:** `{tx_hash}`
+
+_הטוקנים לא הועברו. ניתן לנסות שוב_
+                """
+
+def transfer_error_text(error):
+    return f"""
+**❌ ההעברה נכשלה**
+
+**שגיאה:** {error}
+
+**🚦עדים אפשריים:**
+• וודא שיש לך מספיק BNB לעמלות גז
+• בדוק שהכתובת נכונה
+• נסה שוב בעוד מספר דקות
+                """
+
+PRIVATE_KEY_PROMPT = (
+    "**🔑 הגדרת Private Key**\n\n"
+    "⚠️ **אזהרת אבטחה:**\n"
+    "• Private Key נשמר באופן מקומי בלבד\n"
+    "• לא משותף עם אף אחד\n"
+    "• נחלף להעברות בלבד\n\n"
+    "**📝 שלח את ה-Private Key שלך** (מתחיל ב-0x)...\n"
+    "או שלח 'ביטול' לחזור"
+)
+
+def private_key_saved_text(wallet_address):
+    return (
+        f"✅ **Private Key נשמר בהצלחה!**\n\n"
+        f"**כתובת הארנק שלך:** `{wallet_address}`\n\n"
+        "המפתח נשמר באופן מקומי ובטוח.\n"
+        "כעת תוכל לבצע העברות SLH."
+    )
+
+GIFT_MENU_TEXT = f"""
+**🎁 מרכז המתנות של SLH**
+
+**💎 ערך מטבע:** {SLH_VALUE_ILS} ₪
+**👥 קהילה:** {TELEGRAM_GROUP_URL}
+
+**🎯 אפשרויות שליחה:**
+• **מתנה מהירה** - שליחה ישירה
+• **מתנה עם הודעה** - עם ברכה אישית
+• **מתנה עם חוזה** - עם תנאים ושלבים
+
+**💡 טיפ:** הצטרף לקהילה כדי למצוא יותר חברים לשליחת מתנות!
+    """
+
+CREATE_CONTRACT_TEXT = f"""
+**📝 יצירת חוזה חדש**
+
+חוזה חכם מאפשר לך ליצור עסקאות עם תנאים ושלבים.
+
+**📋 סוגי חוזים:**
+• חוזי עבודה עם תשלומים לפי שלבים
+• חוזי שותפות עם חלוקת רווחים
+• חוזי מתנה עם תנאים
+• חוזים מותאמים אישית
+
+**👥 מומלץ:** הצטרף לקהילה למציאת שותפים:
+{TELEGRAM_GROUP_URL}
+
+*פיצ'ר בשלבי פיתוח - יגיע soon!*
+    """
+
+MY_CONTRACTS_TEXT = """
+**📊 ניהול חוזים**
+
+באפשרותך ליצור חוזים חכמים עם שלבים, לעקוב אחר התקדמות ולנהל עסקאות מורכבות.
+
+**🚀 בחר פעולה:**
+    """
+
+COMMUNITY_TEXT = f"""
+**👥 קהילת SLH - המקום שלנו!**
+
+**🌐 הצטרף עכשיו:**
+{TELEGRAM_GROUP_URL}
+
+**💎 מה מחכה לך בקהילה:**
+• מאות סוחרים פעילים
+• דיונים על מגמות SLH
+• הזדמנויות עסקיות
+• תמיכה和技术支持
+• חדשות ועדכונים
+
+**🚀 שלבי ההצטרפות:**
+1. לחץ על '👥 הצטרף לקהילה'
+2. הוסף את עצמך לקבוצה
+3. חזור לבוט ולחץ '✅ אישור הצטרפות'
+4. קבל גישה מלאה!
+
+**📞 מתקשה?** שלח הודעה למנהלים בקבוצה.
+    """
+
+def settings_text(user_data, has_private_key):
+    return f"""
+**⚙️ הגדרות אישיות**
+
+**👤 פרטים נוכחיים:**
+📞 טלפון: {user_data.phone or 'לא הוגדר'}
+🌐 אתר: {user_data.website or 'לא הוגדר'}
+📁 חומרים: {user_data.materials or 'לא הוגדר'}
+🔑 Private Key: {has_private_key}
+
+**👥 קהילה:** {TELEGRAM_GROUP_URL}
+
+**🔧 אפשרויות:**
+• עדכון פרטי קשר
+• אישור הצטרפות לקהילה
+• ניהול ארנק
+• הגדרות נוספות
+
+**בחר פעולה:**
+    """
+
+def stats_text(user_data):
+    if not user_data:
+        return "לא נמצאו נתונים עבורך במערכת."
+
+    group_status = "✅ חבר בקהילה" if user_data.joined_group else "❌ טרם הצטרף"
+    return f"""
+**📊 הסטטיסטיקה המלאה שלך**
+
+**👤 פרטים:**
+שם: {user_data.first_name} {user_data.last_name or ''}
+משתמש: @{user_data.username or 'לא רשום'}
+סטטוס קהילה: {group_status}
+
+**💼 פעילות:**
+🎁 מתנות שנשלחו: {user_data.total_gifts_sent:,.0f} SLH
+🎁 מתנות שהתקבלו: {user_data.total_gifts_received:,.0f} SLH
+📊 מספר חוזים: *בקרוב*
+
+**👥 {group_status}**
+{TELEGRAM_GROUP_URL if not user_data.joined_group else 'תודה שהצטרפת!'}
+        """
+
+SLH_INFO_TEXT = f"""
+**ℹ️ מידע מלא על מטבע SLH**
+
+**💎 מטבע SLH - Smart Life Hub**
+
+**מידע בסיסי:**
+• **שם:** SLH Token
+• **סימבול:** SLH
+• **רשת:** Binance Smart Chain
+• **ערך נוכחי:** {SLH_VALUE_ILS} ₪
+
+**🏦 הוראות טכניות:**
+• **כתובת חוזה:** `{SLH_TOKEN_ADDRESS}`
+• **Chain ID:** 56
+• **RPC URL:** https://bsc-dataseed.binance.org/
+
+**💎 יתרונות למחזיקים:**
+• גישה לשירותים premium
+• הנחות מיוחדות על שירותים
+• השתתפות בקהילה פעילה
+• הטבות נוספות
+
+**👥 הצטרף לקהילה:** {TELEGRAM_GROUP_URL}
+    """
+
+def wallet_saved_text(wallet_address, current_balance):
+    return f"""
+**✅ כתובת הארנק נשמרה בהצלחה!**
+
+**כתובת:** `{wallet_address}`
+
+**💰 יתרה נוכחית:** {current_balance:,.2f} SLH
+
+**🎉 כעת אתה יכול:**
+• לסחור בחופשיות עם חברי הקהילה
+• לשלוח ולקבל מתנות
+• ליצור חוזים חכמים
+• להיות חלק מהמהפכה!
+
+**👥 הצטרף לקהילה שלנו:**
+{TELEGRAM_GROUP_URL}
+        """
+
+def contact_saved_text(phone, website, materials):
+    return f"""
+**✅ הפרטים נשמרו בהצלחה!**
+
+**👤 הפרטים שלך:**
+📞 טלפון: {phone}
+🌐 אתר: {website}
+📁 חומרים: {materials}
+
+**💼 כעת תוכל:**
+• לשתף את הפרטים שלך
+• לבנות נוכחות מקצועית
+• למצוא שותפים לעסקאות
+
+**👥 הצטרף לקהילה לחיבור עם סוחרים:**
+{TELEGRAM_GROUP_URL}
+        """
+
+def parse_contact_info(text):
+    contact_info = {}
+    for line in text.split('\n'):
+        if ':' in line:
+            key, value = line.split(':', 1)
+            contact_info[key.strip()] = value.strip()
+    return contact_info.get('טלפון', ''), contact_info.get('אתר', ''), contact_info.get('חומרים', '')
+
+UPDATE_CONTACT_TEXT = (
+    "**📞 עדכון פרטי קשר**\n\n"
+    "שלח את הפרטים שלך בפורמט:\n"
+    "`טלפון: 050-1234567\n"
+    "אתר: https://mysite.com\n"
+    "חומרים: קישור לתיק עבודה`"
+)
+
+CONTACT_CONV_PROMPT = "**📞 עדכון פרטי קשר**\n\nשלח את הפרטים בפורמט:\nטלפון: 050-1234567\nאתר: https://example.com\nחומרים: תיאור"
+
+def join_confirmed_text(first_name):
+    return (
+        f"✅ **הצטרפות אושרה!**\n\nברוך הבא לקהילת SLH {first_name}!\n\n"
+        f"**👥 קבוצה:** {TELEGRAM_GROUP_URL}\n"
+        f"**🚀 כעת תוכל:**\n• להתחבר עם סוחרים\n• לשתף בהזדמנויות\n• לקבל תמיכה מהקהילה"
+    )
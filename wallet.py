@@ -1,12 +1,26 @@
+import threading
 from web3 import Web3
-from config import BSC_RPC_URL, TOKEN_CONTRACT_ADDRESS, OWNER_WALLET_ADDRESS, OWNER_WALLET_PRIVATE_KEY, CHAIN_ID
-from contracts import token_abi
+from web3.exceptions import TransactionNotFound
+from config import BSC_RPC_URL, TOKEN_CONTRACT_ADDRESS, OWNER_WALLET_ADDRESS, OWNER_WALLET_PRIVATE_KEY, CHAIN_ID, DISPERSE_ADDRESS
+from contracts import token_abi, allowance_abi, disperse_abi
+from balances import balance_cache
+from multicall import Multicall
+from gas import GasEstimator, GasOracle
+from nonces import NonceManager, is_known_transaction, is_nonce_error
+from rpc import make_web3
+from tokens import token_registry
 
-web3 = Web3(Web3.HTTPProvider(BSC_RPC_URL))
-if not web3.isConnected():
+web3 = make_web3()
+if not web3.is_connected():
     print("Warning: Web3 not connected to RPC", BSC_RPC_URL)
 
-contract = web3.eth.contract(address=Web3.to_checksum_address(TOKEN_CONTRACT_ADDRESS), abi=token_abi)
+contract = web3.eth.contract(address=Web3.to_checksum_address(TOKEN_CONTRACT_ADDRESS), abi=token_abi + allowance_abi)
+multicall = Multicall(web3)
+nonces = NonceManager(web3)
+gas_oracle = GasOracle(web3)
+gas = GasEstimator(web3)
+# Keeps each disperse approval next to the disperse call that spends it
+_disperse_lock = threading.Lock()
 
 def to_wei(amount, decimals=18):
     return int(amount * (10 ** decimals))
@@ -15,34 +29,132 @@ def from_wei(amount, decimals=18):
     return amount / (10 ** decimals)
 
 def get_token_decimals():
-    try:
-        return contract.functions.decimals().call()
-    except:
-        return 18
+    # Resolved once per contract and cached by the token registry, 18 if unavailable
+    return token_registry.decimals(web3, TOKEN_CONTRACT_ADDRESS)
+
+def warm_up():
+    token_registry.warm(web3, [TOKEN_CONTRACT_ADDRESS])
+
+def _fetch_balance(address):
+    raw = contract.functions.balanceOf(address).call()
+    return from_wei(raw, get_token_decimals())
 
 def get_balance(address):
     try:
         address = Web3.to_checksum_address(address)
-        raw = contract.functions.balanceOf(address).call()
+        return balance_cache.get(TOKEN_CONTRACT_ADDRESS, address, lambda: _fetch_balance(address))
+    except Exception as e:
+        return {"error": str(e)}
+
+def get_balances(addresses):
+    # {address: balance} in one Multicall3 round-trip per chunk, None where the read failed
+    try:
+        raw = multicall.balances_of(TOKEN_CONTRACT_ADDRESS, addresses)
         decimals = get_token_decimals()
-        return from_wei(raw, decimals)
     except Exception as e:
         return {"error": str(e)}
+    balances = {}
+    for address, value in raw.items():
+        balances[address] = from_wei(value, decimals) if value is not None else None
+        if value is not None:
+            balance_cache.put(TOKEN_CONTRACT_ADDRESS, address, balances[address])
+    return balances
 
-def send_tokens(to, amount):  # amount in human units (e.g., 1.5 SLH)
+def send_tokens(to, amount, on_signed=None):  # amount in human units (e.g., 1.5 SLH)
     try:
         to = Web3.to_checksum_address(to)
         decimals = get_token_decimals()
         value = to_wei(float(amount), decimals)
-        nonce = web3.eth.get_transaction_count(Web3.to_checksum_address(OWNER_WALLET_ADDRESS))
-        tx = contract.functions.transfer(to, value).build_transaction({
-            'chainId': CHAIN_ID,
-            'gas': 200000,
-            'gasPrice': web3.to_wei('5', 'gwei'),
-            'nonce': nonce
-        })
-        signed_tx = web3.eth.account.sign_transaction(tx, OWNER_WALLET_PRIVATE_KEY)
-        tx_hash = web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+
+        transfer = contract.functions.transfer(to, value)
+        owner = Web3.to_checksum_address(OWNER_WALLET_ADDRESS)
+        # Refuse transfers that would revert before paying gas for them
+        gas.simulate(transfer, owner)
+        balance = get_balance(to)
+        shape = ('funded',) if isinstance(balance, (int, float)) and balance > 0 else ('new',)
+        gas_limit = gas.estimate(transfer, owner, shape)
+
+        def sign(nonce):
+            tx = transfer.build_transaction({
+                'chainId': CHAIN_ID,
+                'gas': gas_limit,
+                'gasPrice': gas_oracle.price(),
+                'nonce': nonce
+            })
+            signed_tx = web3.eth.account.sign_transaction(tx, OWNER_WALLET_PRIVATE_KEY)
+            if on_signed:
+                # Lets callers checkpoint the transaction before it is broadcast
+                on_signed(web3.to_hex(signed_tx.hash), web3.to_hex(signed_tx.rawTransaction), nonce)
+            return signed_tx
+
+        # Nonces come from the local allocator, concurrent sends don't collide
+        tx_hash = nonces.send(owner, sign)
+        balance_cache.on_transfer(TOKEN_CONTRACT_ADDRESS, OWNER_WALLET_ADDRESS, to)
+        return web3.to_hex(tx_hash)
+    except Exception as e:
+        return {"error": str(e)}
+
+def send_tokens_disperse(payments, on_signed=None):  # [(to, amount)] paid in one transaction
+    try:
+        if not DISPERSE_ADDRESS:
+            return {"error": "DISPERSE_ADDRESS is not configured"}
+        disperse = web3.eth.contract(address=Web3.to_checksum_address(DISPERSE_ADDRESS), abi=disperse_abi)
+        decimals = get_token_decimals()
+        recipients = [Web3.to_checksum_address(to) for to, _ in payments]
+        values = [to_wei(float(amount), decimals) for _, amount in payments]
+        owner = Web3.to_checksum_address(OWNER_WALLET_ADDRESS)
+
+        def sign(function, gas_limit, nonce, notify=False):
+            tx = function.build_transaction({
+                'chainId': CHAIN_ID,
+                'gas': gas_limit,
+                'gasPrice': gas_oracle.price(),
+                'nonce': nonce
+            })
+            signed_tx = web3.eth.account.sign_transaction(tx, OWNER_WALLET_PRIVATE_KEY)
+            if notify and on_signed:
+                on_signed(web3.to_hex(signed_tx.hash), web3.to_hex(signed_tx.rawTransaction), nonce)
+            return signed_tx
+
+        with _disperse_lock:
+            # Exactly this batch, mined right before the disperse call that spends it, so no
+            # standing allowance is left on the owner wallet. Consecutive nonces under the
+            # lock keep a concurrent batch's approval from overwriting this one in between.
+            approve = contract.functions.approve(disperse.address, sum(values))
+            approve_gas = gas.estimate(approve, owner)
+            nonces.send(owner, lambda nonce: sign(approve, approve_gas, nonce))
+            # Not estimated: the approval above may not be mined yet, so estimateGas would revert
+            tx_hash = nonces.send(owner, lambda nonce: sign(
+                disperse.functions.disperseToken(contract.address, recipients, values),
+                50000 + 40000 * len(recipients), nonce, notify=True
+            ))
+        for to in recipients:
+            balance_cache.on_transfer(TOKEN_CONTRACT_ADDRESS, owner, to)
         return web3.to_hex(tx_hash)
     except Exception as e:
         return {"error": str(e)}
+
+def transaction_known(tx_hash):
+    # True once the node has seen the transaction (pending or mined)
+    try:
+        web3.eth.get_transaction(tx_hash)
+        return True
+    except TransactionNotFound:
+        return False
+
+def rebroadcast(raw_tx):
+    # Sends a transaction signed earlier again, byte for byte. True once a node
+    # holds it, False if its nonce is already used on the chain
+    try:
+        web3.eth.send_raw_transaction(raw_tx)
+        return True
+    except Exception as e:
+        if is_known_transaction(e):
+            return True
+        if is_nonce_error(e):
+            return False
+        raise
+
+def nonce_confirmed(nonce):
+    # True once a mined transaction of the owner wallet has used this nonce
+    return web3.eth.get_transaction_count(Web3.to_checksum_address(OWNER_WALLET_ADDRESS), 'latest') > nonce